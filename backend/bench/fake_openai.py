@@ -0,0 +1,130 @@
+# bench/fake_openai.py
+#
+# Local stand-in for the Azure OpenAI deployments used by the backend.
+# Embeddings are deterministic (seeded from the input text) and chat/vision
+# completions echo back JSON in the shape llm_helpers.py and main.py parse.
+#
+# Usage: python bench/fake_openai.py --port 8099 --latency-ms 50 --rate-429 0.05
+# then point the backend at it:
+#   AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8099/ OPENAI_ENDPOINT=http://127.0.0.1:8099/
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import time
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+EMBED_DIM = int(os.environ.get("FAKE_EMBED_DIM", "1536"))
+LATENCY_MS = float(os.environ.get("FAKE_LATENCY_MS", "0"))
+JITTER_MS = float(os.environ.get("FAKE_JITTER_MS", "0"))
+RATE_429 = float(os.environ.get("FAKE_RATE_429", "0"))
+
+app = FastAPI()
+_rng = random.Random(int(os.environ.get("FAKE_SEED", "0")))
+
+
+def fake_embedding(text: str, dim: int = None) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim or EMBED_DIM).astype("float32")
+    return vec / np.linalg.norm(vec)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+async def _simulate_load():
+    delay = LATENCY_MS + (_rng.uniform(-JITTER_MS, JITTER_MS) if JITTER_MS else 0)
+    if delay > 0:
+        await asyncio.sleep(delay / 1000.0)
+    if RATE_429 and _rng.random() < RATE_429:
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after-ms": "10"},
+            content={"error": {"code": "429", "message": "Rate limit exceeded (fake)"}},
+        )
+    return None
+
+
+@app.post("/openai/deployments/{deployment}/embeddings")
+async def embeddings(deployment: str, request: Request):
+    throttled = await _simulate_load()
+    if throttled:
+        return throttled
+    body = await request.json()
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    data = []
+    for i, text in enumerate(inputs):
+        vec = fake_embedding(text, body.get("dimensions"))
+        if body.get("encoding_format") == "base64":
+            embedding = base64.b64encode(vec.tobytes()).decode("ascii")
+        else:
+            embedding = vec.tolist()
+        data.append({"object": "embedding", "index": i, "embedding": embedding})
+    prompt_tokens = sum(_tokens(t) for t in inputs)
+    return {
+        "object": "list",
+        "data": data,
+        "model": deployment,
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+    }
+
+
+def _chat_reply(messages: list) -> tuple:
+    content = messages[-1]["content"]
+    if isinstance(content, list):
+        # Vision request: text part + image part
+        prompt = " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+        reply = '{"vision_summary": "A worksheet page with pictures for young learners.", "tags": "pictures, worksheet"}'
+        return prompt, reply
+    raw = content.split('"""')[1].strip() if content.count('"""') >= 2 else content
+    cleaned = " ".join(raw.split())
+    reply = json.dumps({"cleaned_text": cleaned, "tags": "worksheet, practice"})
+    return content, reply
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    throttled = await _simulate_load()
+    if throttled:
+        return throttled
+    body = await request.json()
+    prompt, reply = _chat_reply(body["messages"])
+    prompt_tokens, completion_tokens = _tokens(prompt), _tokens(reply)
+    return {
+        "id": f"fake-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": deployment,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    parser.add_argument("--rate-429", type=float, default=RATE_429)
+    parser.add_argument("--dim", type=int, default=EMBED_DIM)
+    args = parser.parse_args()
+    LATENCY_MS, JITTER_MS, RATE_429, EMBED_DIM = args.latency_ms, args.jitter_ms, args.rate_429, args.dim
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,92 @@
+# bench/make_corpus.py
+#
+# Generates synthetic worksheet PDFs with PyMuPDF for the benchmarks.
+# Usage: python bench/make_corpus.py --out /tmp/corpus --pdfs 20 --pages 10
+
+import argparse
+import os
+import random
+
+import fitz  # PyMuPDF
+
+GRADES = ["Kindergarten", "1st Grade", "2nd Grade", "3rd Grade"]
+UNITS = ["Unit 1", "Unit 2", "Unit 3", "Unit 4", "Unit 5"]
+TOPICS = {
+    "addition": "Add the numbers. Write the sum.",
+    "subtraction": "Subtract. Write how many are left.",
+    "shapes": "Color the circles red and the squares blue.",
+    "counting": "Count the objects and write the number.",
+    "reading": "Read the story and answer the questions.",
+    "phonics": "Say the word. Circle the beginning sound.",
+    "time": "Look at the clock. Write the time.",
+    "money": "Count the coins. How much money is there?",
+}
+WORDS = ["cat", "dog", "sun", "tree", "apple", "ball", "fish", "hat", "map", "frog", "star", "bus"]
+
+
+def worksheet_text(rng: random.Random, topic: str = None) -> str:
+    topic = topic or rng.choice(list(TOPICS))
+    lines = [f"{topic.title()} Practice", TOPICS[topic], "Name: ____________  Date: ________"]
+    for n in range(1, rng.randint(6, 12)):
+        if topic in ("addition", "subtraction", "money", "counting"):
+            a, b = rng.randint(1, 20), rng.randint(1, 10)
+            op = "-" if topic == "subtraction" else "+"
+            lines.append(f"{n}. {max(a, b)} {op} {min(a, b)} = ____")
+        else:
+            lines.append(f"{n}. " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))))
+    return "\n".join(lines)
+
+
+def _noisy(text: str) -> str:
+    # Mimics broken extraction: vertical letter stacks and stray symbols
+    header = "\n".join("PRACTICE")
+    return header + "\n" + text.replace(" ", " • ", 3) + "\n§ ¤ ∆"
+
+
+def make_pdf(path: str, pages: int, rng: random.Random):
+    doc = fitz.open()
+    topic = rng.choice(list(TOPICS))
+    for _ in range(pages):
+        page = doc.new_page()
+        kind = rng.random()
+        if kind < 0.15:
+            # Picture page: one large image, a caption
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), False)
+            pix.clear_with(rng.randint(60, 230))
+            page.insert_image(fitz.Rect(50, 80, 560, 700), pixmap=pix)
+            page.insert_text((72, 740), f"{topic.title()} picture", fontsize=12)
+            continue
+        text = worksheet_text(rng, topic)
+        if kind < 0.35:
+            text = _noisy(text)
+        if kind > 0.8:
+            # Small logo that should not make the page image_heavy
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 16, 16), False)
+            pix.clear_with(120)
+            page.insert_image(fitz.Rect(520, 20, 570, 70), pixmap=pix)
+        page.insert_text((72, 90), text, fontsize=13, fontname="helv")
+    doc.save(path)
+    doc.close()
+
+
+def make_corpus(out_dir: str, pdfs: int, pages: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    paths = []
+    for n in range(pdfs):
+        rel = os.path.join(rng.choice(GRADES), rng.choice(UNITS), f"worksheet-{n:04d}.pdf")
+        path = os.path.join(out_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        make_pdf(path, pages, rng)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic worksheet PDFs")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = make_corpus(args.out, args.pdfs, args.pages, args.seed)
+    print(f"Wrote {len(paths)} PDFs ({len(paths) * args.pages} pages) to {args.out}")
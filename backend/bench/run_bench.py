@@ -0,0 +1,242 @@
+# bench/run_bench.py
+#
+# End-to-end benchmark against a local fake OpenAI server (no Azure spend).
+# For each library size it seeds a fresh database, starts the backend with
+# uvicorn and reports:
+#   - startup time (process start until the API answers)
+#   - upload_pdf throughput in pages/sec
+#   - p50/p99 latency for /search, /files and /graph; /search and /graph are
+#     reported cold (every request a cache miss) and warm (cached)
+#
+# Usage (from backend/):
+#   python bench/run_bench.py --scales 1000,10000,100000 --out bench_results.json
+#
+# Note: with 1536-dim embeddings stored as text, 100k pages is a ~1.5 GB database.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+from sqlalchemy import create_engine, insert
+from sqlmodel import SQLModel
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from models import Page, PageContent, PageEmbedding  # noqa: E402
+from bench.make_corpus import make_corpus, worksheet_text, GRADES, UNITS, TOPICS  # noqa: E402
+from bench.fake_openai import fake_embedding  # noqa: E402
+
+QUERIES = ["addition practice", "color the shapes", "reading story questions", "count coins",
+           "telling time grade 1", "beginning sounds phonics", "subtract within 20", "counting objects"]
+
+
+def seed_pages(db_path: str, n_pages: int, dim: int, seed: int = 0, chunk: int = 2000):
+    engine = create_engine(f"sqlite:///{db_path}")
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    pages, contents, vectors = [], [], []
+
+    def flush(conn):
+        conn.execute(insert(Page.__table__), pages)
+        conn.execute(insert(PageContent.__table__), contents)
+        conn.execute(insert(PageEmbedding.__table__), vectors)
+        pages.clear()
+        contents.clear()
+        vectors.clear()
+
+    with engine.begin() as conn:
+        for n in range(n_pages):
+            pdf_no, page_no = divmod(n, 20)
+            grade, unit = GRADES[pdf_no % len(GRADES)], UNITS[pdf_no % len(UNITS)]
+            topic = topics[pdf_no % len(topics)]
+            text = worksheet_text(rng, topic)
+            tags = [grade, unit, topic]
+            vec = fake_embedding(text + "\n[tags: " + ", ".join(tags) + "]", dim)
+            pages.append({
+                "id": n + 1,
+                "pdf_name": f"seed-{pdf_no:05d}.pdf",
+                "pdf_path": f"{grade}/{unit}/seed-{pdf_no:05d}.pdf",
+                "page_number": page_no + 1,
+                "tags": ",".join(tags),
+            })
+            contents.append({"page_id": n + 1, "text": text, "vision_summary": None})
+            vectors.append({"page_id": n + 1, "embedding": ",".join(vec.round(6).astype(str)), "model": "bench"})
+            if len(pages) >= chunk:
+                flush(conn)
+        if pages:
+            flush(conn)
+    engine.dispose()
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def wait_for(url: str, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def time_requests(base: str, path: str, params_list: list) -> dict:
+    samples = []
+    for params in params_list:
+        start = time.perf_counter()
+        r = requests.get(f"{base}{path}", params=params, timeout=600)
+        r.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return {
+        "n": len(samples),
+        "p50_ms": round(statistics.median(samples), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "bytes": len(r.content),
+    }
+
+
+def time_cold_warm(base: str, path: str, cold_params: list, warm_params: list) -> dict:
+    # /search and /graph answer repeats from in-process caches. Cold requests all have
+    # distinct params, so every one misses; warm requests repeat params after an untimed pass
+    cold = time_requests(base, path, cold_params)
+    time_requests(base, path, warm_params)
+    return {"cold": cold, "warm": time_requests(base, path, warm_params)}
+
+
+def bench_upload(base: str, corpus_dir: str, pdf_paths: list, pages_per_pdf: int) -> dict:
+    start = time.perf_counter()
+    for path in pdf_paths:
+        rel = os.path.relpath(path, corpus_dir)
+        with open(path, "rb") as f:
+            r = requests.post(f"{base}/upload_pdf/", files={"file": (rel, f, "application/pdf")}, timeout=600)
+        r.raise_for_status()
+    elapsed = time.perf_counter() - start
+    pages = len(pdf_paths) * pages_per_pdf
+    return {"pdfs": len(pdf_paths), "pages": pages, "seconds": round(elapsed, 2),
+            "pages_per_sec": round(pages / elapsed, 2)}
+
+
+def run_scale(n_pages: int, args, fake_url: str, corpus_dir: str, pdf_paths: list) -> dict:
+    work_dir = tempfile.mkdtemp(prefix=f"edudocs-bench-{n_pages}-")
+    try:
+        seed_start = time.perf_counter()
+        seed_pages(os.path.join(work_dir, "pages.db"), n_pages, args.dim)
+        seed_seconds = time.perf_counter() - seed_start
+
+        env = dict(os.environ)
+        env.update({
+            "AZURE_OPENAI_ENDPOINT": fake_url,
+            "OPENAI_ENDPOINT": fake_url,
+            "AZURE_OPENAI_API_KEY": "bench",
+            "OPENAI_API_KEY": "bench",
+            "LOG_LEVEL": "WARNING",
+        })
+        base = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+             "--port", str(args.port), "--log-level", "warning"],
+            cwd=work_dir, env=env,
+        )
+        try:
+            startup = wait_for(f"{base}/openapi.json", timeout=args.startup_timeout)
+            rng = random.Random(1)
+            result = {
+                "pages": n_pages,
+                "seed_seconds": round(seed_seconds, 2),
+                "startup_seconds": round(startup, 2),
+                "search": time_cold_warm(
+                    base, "/search",
+                    [{"q": f"{rng.choice(QUERIES)} {n}"} for n in range(args.requests)],
+                    [{"q": QUERIES[n % len(QUERIES)]} for n in range(args.requests)],
+                ),
+                "files": time_requests(base, "/files", [{}] * args.requests),
+                # max_tag_degree only makes each cold request a distinct cache key
+                "graph": time_cold_warm(
+                    base, "/graph",
+                    [{"max_tag_degree": 200 + n} for n in range(max(1, args.requests // 5))],
+                    [{}] * max(1, args.requests // 5),
+                ),
+                "upload": bench_upload(base, corpus_dir, pdf_paths, args.pages),
+            }
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        return result
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_result(r: dict):
+    print(f"\n=== {r['pages']} pages ===")
+    print(f"seed {r['seed_seconds']}s   startup {r['startup_seconds']}s")
+    u = r["upload"]
+    print(f"upload_pdf  {u['pages_per_sec']} pages/sec ({u['pages']} pages in {u['seconds']}s)")
+    for name, label, s in [
+        ("search", "cold", r["search"]["cold"]), ("search", "warm", r["search"]["warm"]),
+        ("files", "", r["files"]),
+        ("graph", "cold", r["graph"]["cold"]), ("graph", "warm", r["graph"]["warm"]),
+    ]:
+        print(f"/{name:<7}{label:<5} p50 {s['p50_ms']} ms   p99 {s['p99_ms']} ms   ({s['n']} requests, {s['bytes']} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EduDocs AI benchmark")
+    parser.add_argument("--scales", default="1000,10000,100000", help="comma-separated page counts")
+    parser.add_argument("--requests", type=int, default=50, help="requests per endpoint")
+    parser.add_argument("--upload-pdfs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=10, help="pages per uploaded PDF")
+    parser.add_argument("--dim", type=int, default=1536, help="must match the backend embedding dimension")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--fake-port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--startup-timeout", type=float, default=900)
+    parser.add_argument("--keep", action="store_true", help="keep the per-scale work directories")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}/"
+    fake = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "bench" / "fake_openai.py"), "--port", str(args.fake_port),
+         "--latency-ms", str(args.latency_ms), "--rate-429", str(args.rate_429), "--dim", str(args.dim)],
+    )
+    corpus_dir = tempfile.mkdtemp(prefix="edudocs-corpus-")
+    results = []
+    try:
+        wait_for(f"{fake_url}docs", timeout=30)
+        pdf_paths = make_corpus(corpus_dir, args.upload_pdfs, args.pages, seed=42)
+        for n_pages in [int(s) for s in args.scales.split(",") if s.strip()]:
+            result = run_scale(n_pages, args, fake_url, corpus_dir, pdf_paths)
+            print_result(result)
+            results.append(result)
+    finally:
+        fake.terminate()
+        fake.wait(timeout=30)
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
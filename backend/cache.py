@@ -0,0 +1,27 @@
+# backend/cache.py
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    # Small in-process cache; keys should include data_version() so stale entries are never hit.
+    # Shared by the endpoint threadpool, so every access holds the lock
+    def __init__(self, size: int):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
@@ -0,0 +1,21 @@
+# backend/data_version.py
+#
+# A counter bumped by every write to pages or tags. Cached responses are keyed
+# on it, so they go stale the moment the library changes. The boot id keeps
+# ETags from one process from matching another's after a restart.
+
+import itertools
+import uuid
+
+_boot_id = uuid.uuid4().hex[:8]
+_counter = itertools.count(1)
+_version = next(_counter)
+
+
+def data_version() -> str:
+    return f"{_boot_id}.{_version}"
+
+
+def bump_data_version():
+    global _version
+    _version = next(_counter)
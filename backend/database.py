@@ -1,11 +1,63 @@
+import os
+from sqlalchemy import inspect, text
 from sqlmodel import SQLModel, create_engine, Session
-from models import Page  # 👈 This is essential!
+from log_config import get_logger
+from request_profile import instrument_engine
+from models import Page, PageContent, PageEmbedding, MaintenanceRun  # 👈 This is essential!
 
 DATABASE_URL = "sqlite:///./pages.db"
-engine = create_engine(DATABASE_URL, echo=True)
+SQL_ECHO = os.environ.get("SQL_ECHO", "false").lower() == "true"
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
+instrument_engine(engine)  # per-request SQL counts, see request_profile.py
+
+# Model of the vectors stored before page_embedding.model existed
+LEGACY_EMBEDDING_MODEL = "azure:text-embedding-3-small"
 
 def init_db():
     SQLModel.metadata.create_all(engine)
+    split_page_columns()
+    migrate_db()
+
+def split_page_columns():
+    # Older databases kept text, vision_summary and embedding on the page row itself;
+    # move them to the side tables and drop them so listing queries stay small
+    inspector = inspect(engine)
+    if not inspector.has_table("page"):
+        return
+    columns = {c["name"] for c in inspector.get_columns("page")}
+    heavy = [c for c in ("text", "vision_summary", "embedding") if c in columns]
+    if not heavy:
+        return
+    with engine.begin() as conn:
+        if "text" in columns:
+            summary = "vision_summary" if "vision_summary" in columns else "NULL"
+            conn.execute(text(
+                f"INSERT OR IGNORE INTO pagecontent (page_id, text, vision_summary) "
+                f"SELECT id, COALESCE(text, ''), {summary} FROM page"
+            ))
+        if "embedding" in columns:
+            conn.execute(text(
+                "INSERT OR IGNORE INTO pageembedding (page_id, embedding, model) "
+                "SELECT id, embedding, :model FROM page WHERE embedding IS NOT NULL"
+            ), {"model": LEGACY_EMBEDDING_MODEL})
+        for column in heavy:
+            conn.execute(text(f'ALTER TABLE page DROP COLUMN "{column}"'))
+    get_logger(__name__).info("moved page columns to side tables", extra={"columns": heavy})
+
+def migrate_db():
+    # create_all never alters existing tables: add new nullable columns and indexes by hand
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+        for idx in table.indexes:
+            idx.create(engine, checkfirst=True)
 
 def get_session():
     return Session(engine)
@@ -1,23 +1,146 @@
 import os
+import re
+import zlib
+
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from metrics import call_api
+from text_cleaning import truncate_to_tokens
+
 load_dotenv()
 
+# Which backend turns text into vectors: "azure" (default), "local" or "hashing"
+EMBEDDING_PROVIDER = os.environ.get("EMBEDDING_PROVIDER", "azure").lower()
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+# Longer page texts are cut to this many (estimated) tokens; text-embedding-3 accepts 8191
+EMBED_MAX_TOKENS = int(os.environ.get("EMBED_MAX_TOKENS", "8000"))
+
 AZURE_OPENAI_API_KEY = os.environ.get("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_ENDPOINT = "https://roberts-openi.openai.azure.com/"
+AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT", "https://roberts-openi.openai.azure.com/")
 AZURE_OPENAI_EMBED_DEPLOYMENT = os.environ.get("AZURE_OPENAI_EMBED_DEPLOYMENT", "text-embedding-3-small")
 AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
 
-client = OpenAI(
-    api_key=AZURE_OPENAI_API_KEY,
-    base_url=f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_EMBED_DEPLOYMENT}/",
-    default_query={"api-version": AZURE_OPENAI_API_VERSION},
-)
+# Local sentence-embedding model directory (e.g. a downloaded all-MiniLM-L6-v2)
+LOCAL_EMBED_MODEL = os.environ.get("LOCAL_EMBED_MODEL", "models/all-MiniLM-L6-v2")
+HASHING_EMBED_DIM = int(os.environ.get("HASHING_EMBED_DIM", "1024"))
+
+AZURE_MODEL_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+class AzureEmbeddingProvider:
+    def __init__(self):
+        self.client = OpenAI(
+            api_key=AZURE_OPENAI_API_KEY,
+            base_url=f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_EMBED_DEPLOYMENT}/",
+            default_query={"api-version": AZURE_OPENAI_API_VERSION},
+            max_retries=0,  # retries are counted in metrics.call_api
+        )
+        self.name = f"azure:{AZURE_OPENAI_EMBED_DEPLOYMENT}"
+        self.dim = AZURE_MODEL_DIMS.get(AZURE_OPENAI_EMBED_DEPLOYMENT, 1536)
+        # text-embedding-3 models can return shortened vectors; the API is asked for that size
+        self.dimensions = None
+        if os.environ.get("AZURE_OPENAI_EMBED_DIM"):
+            self.dim = self.dimensions = int(os.environ["AZURE_OPENAI_EMBED_DIM"])
+            self.name += f"@{self.dim}"  # vectors of the full size are stale for the reembed job
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            response = call_api(
+                "embedding",
+                self.client.embeddings.create,
+                model=AZURE_OPENAI_EMBED_DEPLOYMENT,
+                input=texts[start:start + EMBED_BATCH_SIZE],
+                **({"dimensions": self.dimensions} if self.dimensions else {}),
+            )
+            vectors.extend(d.embedding for d in sorted(response.data, key=lambda d: d.index))
+        return vectors
+
+
+class LocalEmbeddingProvider:
+    # Runs an on-disk sentence-transformers model on CPU; nothing leaves the machine
+    def __init__(self):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_PROVIDER=local needs the sentence-transformers package"
+            ) from e
+        self.model = SentenceTransformer(LOCAL_EMBED_MODEL, device="cpu")
+        self.name = f"local:{os.path.basename(os.path.normpath(LOCAL_EMBED_MODEL))}"
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.model.encode(
+            texts, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.astype("float32").tolist()
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddingProvider:
+    # Deterministic feature hashing of words and word pairs; no model, no network
+    def __init__(self, dim: int = HASHING_EMBED_DIM):
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                cols.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        matrix = np.zeros((len(texts), self.dim), dtype="float32")
+        np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)),
+                  np.array(signs, dtype="float32"))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+
+PROVIDERS = {
+    "azure": AzureEmbeddingProvider,
+    "local": LocalEmbeddingProvider,
+    "hashing": HashingEmbeddingProvider,
+}
+
+
+def get_provider(name: str = EMBEDDING_PROVIDER):
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {name!r}, expected one of {sorted(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+
+provider = get_provider()
+EMBEDDING_DIM = provider.dim
+EMBEDDING_MODEL = provider.name
+
+
+def page_embed_text(text: str, tags: list[str]):
+    # What gets embedded for a page: its text plus its tags; None when there is too little to embed
+    embed_text = truncate_to_tokens(text or "", EMBED_MAX_TOKENS)
+    if tags:
+        embed_text = embed_text.strip() + "\n[tags: " + ", ".join(tags) + "]"
+    return embed_text if len(embed_text.strip()) > 10 else None
+
+
+def get_embeddings(texts: list[str]) -> list[list[float]]:
+    if not texts:
+        return []
+    return provider.embed(texts)
+
 
 def get_embedding(text: str) -> list[float]:
-    response = client.embeddings.create(
-        model=AZURE_OPENAI_EMBED_DEPLOYMENT,
-        input=[text],
-    )
-    return response.data[0].embedding
+    return provider.embed([text])[0]
@@ -1,33 +1,201 @@
 # backend/faiss_index.py
+#
+# Page vectors are kept in one FAISS index per partition:
+#   INDEX_PARTITION_BY=folder (default) - top-level folder of the upload path, e.g. "grade 1"
+#   INDEX_PARTITION_BY=tag              - the page's tag matching INDEX_PARTITION_TAG_PATTERN, if only one does
+#   INDEX_PARTITION_BY=none             - one partition for everything
+# A scoped search scans only its partition. An unscoped search merges all of them.
+# Partitions can be unloaded to INDEX_DIR and are loaded again on first use.
+# INDEX_MAX_LOADED_PARTITIONS caps how many stay in memory.
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional
 
 import faiss
 import numpy as np
-from typing import List, Tuple
-from models import Page
+
+from request_profile import faiss_timer
+
+INDEX_PARTITION_BY = os.environ.get("INDEX_PARTITION_BY", "folder").lower()
+INDEX_PARTITION_TAG_PATTERN = os.environ.get("INDEX_PARTITION_TAG_PATTERN", r"^grade\b")
+INDEX_MAX_LOADED_PARTITIONS = int(os.environ.get("INDEX_MAX_LOADED_PARTITIONS", "0"))  # 0 = no limit
+INDEX_DIR = os.environ.get("INDEX_DIR", "uploads/index")
+
+PARTITION_MODES = ("none", "folder", "tag")
+DEFAULT_PARTITION = ""
 
 class PageIndex:
-    def __init__(self):
-        self.index = faiss.IndexFlatL2(1536)  # 1536 dims for text-embedding-3-small
-        self.page_map: List[Tuple[int, str]] = []  # (page_id, text)
+    def __init__(self, dim: int, partition_by: str = INDEX_PARTITION_BY,
+                 max_loaded: int = INDEX_MAX_LOADED_PARTITIONS, index_dir: str = INDEX_DIR):
+        if partition_by not in PARTITION_MODES:
+            raise ValueError(f"Unknown INDEX_PARTITION_BY {partition_by!r}, expected one of {PARTITION_MODES}")
+        self.dim = dim  # set by the embedding provider, see embedding.EMBEDDING_DIM
+        self.partition_by = partition_by
+        self.max_loaded = max_loaded
+        self.index_dir = index_dir
+        self.tag_pattern = re.compile(INDEX_PARTITION_TAG_PATTERN, re.IGNORECASE)
+        self.loaded = OrderedDict()  # partition -> FAISS index, least recently used first
+        self.sizes = {}  # partition -> vector count, loaded or not
+        self.page_partition = {}  # page id -> partition; text stays in the DB
+        self.lock = threading.RLock()
+        shutil.rmtree(self.index_dir, ignore_errors=True)  # spilled partitions of a previous run
+
+    def _new_index(self):
+        # Vectors are stored under their page id so single pages can be removed in place
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.dim))
+
+    @property
+    def page_ids(self):
+        return self.page_partition.keys()
+
+    @property
+    def ntotal(self) -> int:
+        return len(self.page_partition)
+
+    @property
+    def loaded_vectors(self) -> int:
+        return sum(ix.ntotal for ix in list(self.loaded.values()))
+
+    def partition_for(self, pdf_path: Optional[str], tags: Optional[str] = None) -> str:
+        if self.partition_by == "folder":
+            parts = (pdf_path or "").replace("\\", "/").strip("/").split("/")
+            return parts[0].strip().lower() if len(parts) > 1 else DEFAULT_PARTITION
+        if self.partition_by == "tag":
+            matches = {t.strip().lower() for t in (tags or "").split(",") if self.tag_pattern.search(t.strip())}
+            if len(matches) == 1:
+                return matches.pop()
+            # No grade tag, or several: the page belongs to none of them alone
+        return DEFAULT_PARTITION
+
+    def scope(self, folder: Optional[str] = None, tag: Optional[str] = None) -> Optional[List[str]]:
+        # Partitions a filtered search needs; None (search them all) when the filter
+        # doesn't line up with partitions
+        with self.lock:
+            if self.partition_by == "folder" and folder:
+                # A partition is only the top level; the caller still has to rule out the
+                # folder also appearing deeper down in other partitions (main.search_partitions)
+                parts = folder.replace("\\", "/").strip("/").split("/")
+                key = parts[0].strip().lower()
+                if len(parts) == 1 and key in self.sizes:
+                    return [key]
+            if self.partition_by == "tag" and tag and self.tag_pattern.search(tag.strip()):
+                # The tag filter is a substring match ("grade 1" also matches "grade 10"),
+                # and pages with several grade tags sit in the default partition
+                needle = tag.strip().lower()
+                return [p for p in self.sizes if needle in p] + [DEFAULT_PARTITION]
+            return None
+
+    def _spill_path(self, partition: str) -> str:
+        slug = re.sub(r"[^a-z0-9]+", "_", partition) or "default"
+        digest = hashlib.sha1(partition.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.index_dir, f"{slug}-{digest}.faiss")
+
+    def _get(self, partition: str, create: bool = False):
+        ix = self.loaded.get(partition)
+        if ix is None:
+            if partition in self.sizes:
+                path = self._spill_path(partition)
+                ix = faiss.read_index(path)
+                os.remove(path)
+            elif create:
+                ix = self._new_index()
+                self.sizes[partition] = 0
+            else:
+                return None
+            self.loaded[partition] = ix
+            while self.max_loaded and len(self.loaded) > self.max_loaded:
+                self.unload(next(iter(self.loaded)))
+        self.loaded.move_to_end(partition)
+        return ix
+
+    def load(self, partition: str) -> bool:
+        with self.lock:
+            return self._get(partition) is not None
+
+    def unload(self, partition: str) -> bool:
+        # Writes the partition to INDEX_DIR and frees its memory
+        with self.lock:
+            ix = self.loaded.pop(partition, None)
+            if ix is None:
+                return False
+            os.makedirs(self.index_dir, exist_ok=True)
+            faiss.write_index(ix, self._spill_path(partition))
+            return True
+
+    def partitions(self) -> list:
+        with self.lock:
+            return [
+                {"partition": p, "vectors": n, "loaded": p in self.loaded}
+                for p, n in sorted(self.sizes.items())
+            ]
+
+    def add(self, page_id: int, embedding: List[float], partition: str = DEFAULT_PARTITION):
+        self.add_many([page_id], np.array([embedding], dtype='float32'), partition)
+
+    def add_many(self, page_ids: List[int], vectors: np.ndarray, partitions=DEFAULT_PARTITION):
+        # partitions: one key for all vectors, or a list with one key per vector
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding has {vectors.shape[1]} dims, index expects {self.dim}")
+        if isinstance(partitions, str):
+            partitions = [partitions] * len(page_ids)
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        rows_by_partition = {}
+        for row, partition in enumerate(partitions):
+            rows_by_partition.setdefault(partition, []).append(row)
+        with self.lock:
+            self.remove(page_ids)
+            for partition, rows in rows_by_partition.items():
+                ids = [page_ids[r] for r in rows]
+                ix = self._get(partition, create=True)
+                with faiss_timer():
+                    ix.add_with_ids(vectors[rows], np.array(ids, dtype=np.int64))
+                self.sizes[partition] += len(ids)
+                self.page_partition.update((pid, partition) for pid in ids)
 
-    def add(self, page: Page, embedding: List[float]):
-        vec = np.array([embedding], dtype='float32')
-        self.index.add(vec)
-        self.page_map.append((page.id, page.text))
+    def remove(self, page_ids: Iterable[int]) -> int:
+        with self.lock:
+            ids_by_partition = {}
+            for pid in page_ids:
+                partition = self.page_partition.pop(pid, None)
+                if partition is not None:
+                    ids_by_partition.setdefault(partition, []).append(pid)
+            for partition, ids in ids_by_partition.items():
+                ix = self._get(partition)
+                with faiss_timer():
+                    ix.remove_ids(np.array(ids, dtype=np.int64))
+                self.sizes[partition] -= len(ids)
+                if not self.sizes[partition]:
+                    del self.sizes[partition]
+                    del self.loaded[partition]
+            return sum(len(ids) for ids in ids_by_partition.values())
 
-    def search(self, query_embedding: List[float], top_k: int = 5):
+    def search(self, query_embedding: List[float], top_k: int = 5, partitions: Optional[List[str]] = None):
         vec = np.array([query_embedding], dtype='float32')
-        distances, indices = self.index.search(vec, top_k)
         results = []
-        for i in indices[0]:
-            if i < len(self.page_map):
-                page_id, text = self.page_map[i]
-                results.append({
-                    "page_id": page_id,
-                    "text": text
-                })
-        return results
+        # Flat indexes aren't safe to search while maintenance adds or removes vectors
+        with self.lock:
+            keys = [p for p in (self.sizes if partitions is None else partitions) if p in self.sizes]
+            for ix in [self._get(p) for p in keys]:
+                with faiss_timer():
+                    distances, ids = ix.search(vec, top_k)
+                for page_id, distance in zip(ids[0], distances[0]):
+                    if page_id >= 0:  # -1 when fewer than top_k vectors
+                        results.append({
+                            "page_id": int(page_id),
+                            "distance": float(distance)
+                        })
+        # Every partition is an exact (flat) index, so merging by distance matches a single global index
+        results.sort(key=lambda r: r["distance"])
+        return results[:top_k]
 
     def clear(self):
-        self.index = faiss.IndexFlatL2(1536)
-        self.page_map = []
+        with self.lock:
+            self.loaded = OrderedDict()
+            self.sizes = {}
+            self.page_partition = {}
+            shutil.rmtree(self.index_dir, ignore_errors=True)
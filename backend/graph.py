@@ -0,0 +1,120 @@
+# backend/graph.py
+#
+# Builds the tag/page graph for /graph. Two shapes:
+#   pages   - page nodes + page->tag edges, keyset-paginated by page id and
+#             streamed; tags linked to more than max_tag_degree pages in one
+#             response keep only the first edges and are marked truncated
+#   summary - tag nodes with page counts + weighted tag co-occurrence edges
+# Finished bodies are cached under their ETag (which includes the data version).
+
+import hashlib
+import json
+import os
+from collections import Counter
+from itertools import combinations
+
+from sqlalchemy import String
+from sqlmodel import func, or_
+
+from cache import LRUCache
+from data_version import data_version
+from models import Page
+
+GRAPH_PAGE_LIMIT = int(os.environ.get("GRAPH_PAGE_LIMIT", "500"))
+GRAPH_MAX_TAG_DEGREE = int(os.environ.get("GRAPH_MAX_TAG_DEGREE", "200"))
+GRAPH_CACHE_SIZE = int(os.environ.get("GRAPH_CACHE_SIZE", "32"))
+CHUNK_ELEMENTS = 200
+
+
+def split_tags(tags):
+    return [t.strip().lower() for t in (tags or "").split(",") if t.strip()]
+
+
+def filter_pages(query, pdf=None, tag=None, folder=None):
+    if pdf:
+        query = query.where(Page.pdf_name == pdf)
+    if tag:
+        # Exact tag match on the comma-joined column (",a,b," LIKE "%,a,%")
+        normalized = "," + func.lower(func.replace(Page.tags, ", ", ","), type_=String) + ","
+        query = query.where(normalized.like(f"%,{tag.strip().lower()},%"))
+    if folder:
+        path = func.replace(Page.pdf_path, "\\", "/")
+        query = query.where(or_(path.like(f"{folder}/%"), path.like(f"%/{folder}/%")))
+    return query
+
+
+def graph_etag(params: dict) -> str:
+    key = json.dumps(params, sort_keys=True)
+    return f'"{data_version()}-{hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]}"'
+
+
+def stream_page_graph(rows, next_cursor, max_tag_degree=GRAPH_MAX_TAG_DEGREE):
+    # rows: (id, page_number, pdf_name, tags); yields the JSON body in chunks
+    tag_degree = Counter()
+    truncated = set()
+    edges = []
+
+    yield b'{"nodes":['
+    first = True
+    buf = []
+    for p_id, p_number, p_pdf, p_tags in rows:
+        buf.append({"data": {"id": f"page-{p_id}", "label": f"Page {p_number}", "type": "page", "pdf": p_pdf}})
+        for tag in split_tags(p_tags):
+            tag_degree[tag] += 1
+            if tag_degree[tag] > max_tag_degree:
+                truncated.add(tag)
+                continue
+            edges.append({"data": {"source": f"page-{p_id}", "target": f"tag-{tag}"}})
+        if len(buf) >= CHUNK_ELEMENTS:
+            yield _join(buf, first)
+            first, buf = False, []
+    buf.extend(
+        {"data": {"id": f"tag-{tag}", "label": tag, "type": "tag", "page_count": count, "truncated": tag in truncated}}
+        for tag, count in tag_degree.items()
+    )
+    if buf:
+        yield _join(buf, first)
+
+    yield b'],"edges":['
+    for start in range(0, len(edges), CHUNK_ELEMENTS):
+        yield _join(edges[start:start + CHUNK_ELEMENTS], start == 0)
+    yield b'],"next_cursor":' + json.dumps(next_cursor).encode("utf-8") + b"}"
+
+
+def _join(elements, first):
+    body = ",".join(json.dumps(e, separators=(",", ":")) for e in elements)
+    return (body if first else "," + body).encode("utf-8")
+
+
+def summary_graph(rows, max_tags=200, max_edges=1000):
+    # rows: (tags,) per page
+    tag_counts = Counter()
+    pair_counts = Counter()
+    for (p_tags,) in rows:
+        tags = sorted(set(split_tags(p_tags)))
+        tag_counts.update(tags)
+        pair_counts.update(combinations(tags, 2))
+    top_tags = dict(tag_counts.most_common(max_tags))
+    nodes = [
+        {"data": {"id": f"tag-{tag}", "label": tag, "type": "tag", "page_count": count}}
+        for tag, count in top_tags.items()
+    ]
+    pairs = [(pair, n) for pair, n in pair_counts.most_common() if pair[0] in top_tags and pair[1] in top_tags]
+    edges = [
+        {"data": {"source": f"tag-{a}", "target": f"tag-{b}", "weight": n}}
+        for (a, b), n in pairs[:max_edges]
+    ]
+    return {"nodes": nodes, "edges": edges, "next_cursor": None}
+
+
+class GraphCache(LRUCache):
+    def __init__(self, size: int = GRAPH_CACHE_SIZE):
+        super().__init__(size)
+
+    def caching(self, etag, chunks):
+        # Passes chunks through to the client and keeps the finished body
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.put(etag, b"".join(parts))
@@ -3,17 +3,23 @@ import json
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from metrics import call_api
+from text_cleaning import truncate_to_tokens
+
 load_dotenv()
 
 AZURE_OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 OPENAI_ENDPOINT = os.environ.get("OPENAI_ENDPOINT")
 AZURE_OPENAI_VISION_DEPLOYMENT = os.environ.get("AZURE_OPENAI_VISION_DEPLOYMENT", "gpt-4")  # This is your *deployment name*, e.g., "gpt-4"
 AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
+TAG_MAX_INPUT_TOKENS = int(os.environ.get("TAG_MAX_INPUT_TOKENS", "400"))  # text per page sent to generate_tags
+TAG_BATCH_PAGES = int(os.environ.get("TAG_BATCH_PAGES", "20"))  # pages per generate_tags call
 
 client = OpenAI(
     api_key=AZURE_OPENAI_API_KEY,
     base_url=f"{OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_VISION_DEPLOYMENT}/",
     default_query={"api-version": AZURE_OPENAI_API_VERSION},
+    max_retries=0,  # retries are counted in metrics.call_api
 )
 
 def clean_text_and_generate_tags(raw_text: str) -> tuple[str, list[str]]:
@@ -34,7 +40,9 @@ Raw worksheet text:
 \"\"\"
 """
 
-    completion = client.chat.completions.create(
+    completion = call_api(
+        "chat",
+        client.chat.completions.create,
         model=AZURE_OPENAI_VISION_DEPLOYMENT,
         messages=[{"role": "user", "content": prompt}],
         max_tokens=700,
@@ -55,3 +63,47 @@ Raw worksheet text:
         except Exception:
             continue
     return raw_text.strip(), []
+
+
+def generate_tags(texts: list[str]) -> list[list[str]]:
+    # Tag-only call for pages whose text needs no LLM cleanup: several pages per request,
+    # each truncated, and a few words back per page instead of the whole page rewritten
+    pages = "\n\n".join(
+        f'Page {n}:\n"""\n{truncate_to_tokens(text, TAG_MAX_INPUT_TOKENS)}\n"""'
+        for n, text in enumerate(texts, 1)
+    )
+    prompt = f"""Suggest up to 3 comma-separated relevant tags for each of these elementary worksheet pages (such as 'addition', 'shapes', 'story', 'reading', etc).
+
+Respond in this JSON format, one entry per page number:
+{{
+  "1": "tag1, tag2, tag3",
+  "2": "tag1, tag2"
+}}
+
+{pages}
+"""
+
+    completion = call_api(
+        "chat",
+        client.chat.completions.create,
+        model=AZURE_OPENAI_VISION_DEPLOYMENT,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=20 * len(texts) + 20,
+        temperature=0.2,
+    )
+
+    for choice in completion.choices:
+        try:
+            content = choice.message.content.strip()
+            if content.startswith("```json"):
+                content = content.split("```json")[-1].split("```")[0].strip()
+            elif content.startswith("```"):
+                content = content.split("```")[-1].split("```")[0].strip()
+            data = json.loads(content)
+            return [
+                [t.strip() for t in str(data.get(str(n), "")).split(",") if t.strip()][:3]
+                for n in range(1, len(texts) + 1)
+            ]
+        except Exception:
+            continue
+    return [[] for _ in texts]
@@ -1,5 +1,7 @@
 import os
-import re
+import json
+import math
+import hashlib
 import tempfile
 import subprocess
 from pathlib import Path
@@ -9,22 +11,46 @@ import fitz  # PyMuPDF
 import numpy as np
 
 from fastapi import (
-    FastAPI, UploadFile, File, Form, Query, Body, Depends, HTTPException
+    FastAPI, UploadFile, File, Form, Query, Body, Depends, HTTPException, Request
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from sqlmodel import SQLModel, select, func, case
+from sqlalchemy.orm import selectinload
+from sqlmodel import SQLModel, select, delete, func, case
 from pydantic import BaseModel
 
-from models import Page
+from models import Page, PageContent, PageEmbedding
 from database import init_db, get_session
-from embedding import get_embedding
+from embedding import (
+    get_embedding, get_embeddings, page_embed_text, EMBEDDING_DIM, EMBEDDING_MODEL, EMBED_BATCH_SIZE,
+)
 from faiss_index import PageIndex
-from pdf_preview import render_page_preview
+from pdf_preview import render_page_preview, save_page_preview, preview_path_for
 from vision import run_vision_model
-from llm_helpers import clean_text_and_generate_tags
+from llm_helpers import clean_text_and_generate_tags, generate_tags, TAG_BATCH_PAGES
+from page_classifier import (
+    classify_page, routing_report, ROUTE_LLM_CLEAN, ROUTE_VISION, MIN_TEXT_CHARS, TAG_CLEAN_PAGES,
+)
+from metrics import (
+    INGEST_STAGE_SECONDS, INGEST_PAGES, INGEST_TEXT_TOKENS, SEARCH_STAGE_SECONDS, SEARCH_SECONDS,
+    REQUEST_SQL_STATEMENTS,
+    track_index, record_error, render_metrics
+)
+from log_config import get_logger
+from data_version import bump_data_version, data_version
+from graph import (
+    GRAPH_PAGE_LIMIT, GRAPH_MAX_TAG_DEGREE, GraphCache, filter_pages, graph_etag,
+    stream_page_graph, summary_graph
+)
+from cache import LRUCache
+import maintenance
+from request_profile import ProfiledRoute, start_request, end_request, log_request, should_profile
+from snippets import SNIPPET_CHARS, make_snippet, query_pattern
+from text_cleaning import clean_pages, estimate_tokens
+
+log = get_logger("edudocs")
 
 
 # Ensure the preview directory exists BEFORE mounting as static
@@ -49,6 +75,22 @@ def vision_context_prompt(tags, extracted_text, extra_context=None):
     return prompt
 
 app = FastAPI()
+app.router.route_class = ProfiledRoute  # before any route is declared
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    stats, token = start_request(profile=should_profile())
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        end_request(token)
+        route = request.scope.get("route")
+        if route is not None:
+            REQUEST_SQL_STATEMENTS.labels(route=route.path).observe(stats.sql_count)
+        log_request(stats, request.method, request.url.path, status)
 
 # Serve PNG previews at /previews/*
 app.mount("/previews", StaticFiles(directory="uploads/previews"), name="previews")
@@ -59,25 +101,131 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 init_db()
-index = PageIndex()
+index = PageIndex(EMBEDDING_DIM)
+track_index(index)
+graph_cache = GraphCache()
+
+SEARCH_PAGE_LIMIT = int(os.environ.get("SEARCH_PAGE_LIMIT", "20"))
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "64"))
+# Ranked (page_id, pdf_name, page_number, tags, score) lists, so paging never re-embeds the query
+search_cache = LRUCache(SEARCH_CACHE_SIZE)
+
+RESULT_FIELDS = ("page_id", "pdf_name", "page_number", "tags", "score", "snippet", "text", "vision_summary")
+SEARCH_DEFAULT_FIELDS = "page_id,pdf_name,page_number,tags,score,snippet"
+PAGES_DEFAULT_FIELDS = "page_id,page_number,tags,vision_summary,snippet"
+
+def parse_fields(fields: str):
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in RESULT_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields {unknown}, expected a comma list of {list(RESULT_FIELDS)}",
+        )
+    return selected
 
-# Rebuild FAISS index from existing DB entries
-session = get_session()
+def page_contents(session, page_ids, fields):
+    # Only touches the side table when the caller asked for something that lives there
+    if not page_ids or not {"snippet", "text", "vision_summary"} & set(fields):
+        return {}
+    return {
+        r[0]: r for r in session.exec(
+            select(PageContent.page_id, PageContent.text, PageContent.vision_summary)
+            .where(PageContent.page_id.in_(page_ids))
+        )
+    }
 
-# Wipe out any previous index and mapping
-index.clear()
+def project_result(values, content, fields, pattern=None, snippet_chars=SNIPPET_CHARS):
+    text = content[1] if content else ""
+    out = {}
+    for field in fields:
+        if field == "snippet":
+            out["snippet"], out["highlights"] = make_snippet(text, pattern, snippet_chars)
+        elif field == "text":
+            out["text"] = text or ""
+        elif field == "vision_summary":
+            out["vision_summary"] = content[2] if content else None
+        else:
+            out[field] = values.get(field)
+    return out
+
+def paged_response(items, next_cursor):
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+    return JSONResponse(items, headers=headers)
+
+def parse_embedding(value):
+    return np.array(value.split(","), dtype="float32")
+
+def set_page_text(page, text=None, vision_summary=None):
+    # Updates the side-table row in place (replacing it would reuse the primary key mid-flush)
+    if page.content is None:
+        page.content = PageContent(text="")
+    if text is not None:
+        page.content.text = text
+    page.content.vision_summary = vision_summary
+
+def set_page_embedding(page, embedding):
+    if not embedding:
+        page.vector = None
+        return
+    value = ",".join(map(str, embedding))
+    if page.vector is None:
+        page.vector = PageEmbedding(embedding=value, model=EMBEDDING_MODEL)
+    else:
+        page.vector.embedding = value
+        page.vector.model = EMBEDDING_MODEL
 
-pages = session.exec(select(Page)).all()
-for page in pages:
-    if page.embedding:
-        embedding = np.array(list(map(float, page.embedding.split(",")))).tolist()
-        index.add(page, embedding)
+def page_partition(page):
+    return index.partition_for(page.pdf_path or page.pdf_name, page.tags)
+
+def index_page(page):
+    if page.vector:
+        index.add(page.id, parse_embedding(page.vector.embedding), page_partition(page))
+    else:
+        index.remove([page.id])
+
+def rebuild_index(session, batch_size=5000):
+    # Wipe out any previous index and mapping, then reload every stored embedding
+    index.clear()
+    skipped = 0
+    ids, vectors, partitions = [], [], []
+    with INGEST_STAGE_SECONDS.labels(stage="index_update").time():
+        rows = session.exec(
+            select(PageEmbedding.page_id, PageEmbedding.embedding, Page.pdf_path, Page.pdf_name, Page.tags)
+            .join(Page, Page.id == PageEmbedding.page_id)
+        )
+        for page_id, value, pdf_path, pdf_name, tags in rows:
+            vec = parse_embedding(value)
+            if len(vec) != index.dim:
+                skipped += 1  # embedded by a different provider; needs re-embedding
+                continue
+            ids.append(page_id)
+            vectors.append(vec)
+            partitions.append(index.partition_for(pdf_path or pdf_name, tags))
+            if len(ids) >= batch_size:
+                index.add_many(ids, np.vstack(vectors), partitions)
+                ids, vectors, partitions = [], [], []
+        if ids:
+            index.add_many(ids, np.vstack(vectors), partitions)
+    if skipped:
+        log.warning("embeddings with wrong dimension skipped", extra={
+            "skipped": skipped, "index_dim": index.dim, "model": EMBEDDING_MODEL,
+        })
+
+# Rebuild FAISS index from existing DB entries
+session = get_session()
+rebuild_index(session)
+log.info("index loaded", extra={
+    "vectors": index.ntotal, "dim": index.dim, "model": EMBEDDING_MODEL,
+    "partition_by": index.partition_by, "partitions": len(index.sizes),
+})
 
 class TagUpdate(BaseModel):
     tags: str
@@ -87,138 +235,303 @@ class ExportRequest(BaseModel):
     order: List[int]
     title: Optional[str] = None
 
+def page_content_hash(page_obj, raw_text):
+    # Text plus image digests: unchanged pages keep their hash across re-saves of the PDF
+    h = hashlib.sha256(raw_text.encode("utf-8"))
+    for info in page_obj.get_image_info(hashes=True):
+        h.update(info.get("digest") or b"")
+    return h.hexdigest()
+
+def remove_previews(pdf_name, page_numbers):
+    for n in page_numbers:
+        try:
+            os.remove(preview_path_for(pdf_name, n))
+        except FileNotFoundError:
+            pass
+
+def folder_tags_for(path):
+    if not path or ("/" not in path and "\\" not in path):
+        return []
+    return [f for f in os.path.dirname(path).replace("\\", "/").split("/") if f]
+
+def move_page(page, original_path):
+    # Same content uploaded from another folder: new path, and its folder tags swapped.
+    # Returns True when the tags changed, which makes the page's vector stale
+    old_tags = [t for t in (page.tags or "").split(",") if t]
+    old_folders = set(folder_tags_for(page.pdf_path))
+    tags = [t for t in old_tags if t not in old_folders]
+    tags += [f for f in folder_tags_for(original_path) if f not in tags]
+    page.pdf_path = original_path
+    page.tags = ",".join(tags) if tags else None
+    return set(tags) != set(old_tags)
+
+def ingest_page(page, page_obj, raw_text, text, original_path):
+    # Fills `page` (new or existing row) from the PDF page and its locally cleaned `text`;
+    # returns (classification, preview_url, needs_tags). upload_pdf tags and embeds the whole document at once
+    filename = page.pdf_name
+    i = page.page_number - 1
+    INGEST_TEXT_TOKENS.labels(kind="raw").inc(estimate_tokens(raw_text))
+    INGEST_TEXT_TOKENS.labels(kind="cleaned").inc(estimate_tokens(text))
+    with INGEST_STAGE_SECONDS.labels(stage="classify").time():
+        # --- Local routing: decide which paid calls this page needs ---
+        classification = classify_page(page_obj, text)
+    classification["page_number"] = i + 1
+    INGEST_PAGES.labels(route=classification["route"]).inc()
+    is_image_heavy = classification["route"] == ROUTE_VISION
+
+    # --- AI Cleaning & Tag Generation (only for noisy text; other pages are tagged in batches) ---
+    cleaned_text, ai_tags = text, []
+    if classification["route"] == ROUTE_LLM_CLEAN:
+        with INGEST_STAGE_SECONDS.labels(stage="clean_tag").time():
+            try:
+                cleaned_text, ai_tags = clean_text_and_generate_tags(text)
+            except Exception as e:
+                record_error("clean_tag")
+                log.warning("ai cleaning failed", extra={"pdf": filename, "page": i + 1, "error": str(e)})
+                cleaned_text, ai_tags = text, []
+    needs_tags = classification["route"] != ROUTE_LLM_CLEAN and TAG_CLEAN_PAGES and len(text) >= MIN_TEXT_CHARS
+
+    tags = list(set(ai_tags + folder_tags_for(original_path)))
+    if is_image_heavy:
+        tags.append("image_heavy")
+
+    page.pdf_path = original_path
+    page.tags = ",".join(tags) if tags else None
+    # Save cleaned text; content changed, so any old vision summary is stale
+    set_page_text(page, cleaned_text, vision_summary=None)
+
+    # Generate preview image
+    with INGEST_STAGE_SECONDS.labels(stage="preview").time():
+        try:
+            save_page_preview(page_obj.parent, filename, i + 1)
+            preview_url = f"http://localhost:8000/previews/{filename}-page{i+1}.png"
+        except Exception as e:
+            record_error("preview")
+            log.warning("preview failed", extra={"pdf": filename, "page": i + 1, "error": str(e)})
+            preview_url = None
+
+    return classification, preview_url, needs_tags
+
+def tag_document_pages(filename, pages):
+    # Tag-only calls for pages that skipped the cleanup call, TAG_BATCH_PAGES pages per call;
+    # returns the number of calls
+    calls = 0
+    for start in range(0, len(pages), TAG_BATCH_PAGES):
+        batch = pages[start:start + TAG_BATCH_PAGES]
+        calls += 1
+        with INGEST_STAGE_SECONDS.labels(stage="tag").time():
+            try:
+                tag_lists = generate_tags([page.content.text for page in batch])
+            except Exception as e:
+                record_error("tag")
+                log.warning("ai tagging failed", extra={"pdf": filename, "pages": len(batch), "error": str(e)})
+                continue
+        for page, ai_tags in zip(batch, tag_lists):
+            tags = [t for t in (page.tags or "").split(",") if t]
+            tags += [t for t in ai_tags if t not in tags]
+            page.tags = ",".join(tags) if tags else None
+    return calls
+
+def embed_document_pages(filename, pages, embed_texts):
+    # One batched embedding call per upload (the provider splits it into EMBED_BATCH_SIZE requests);
+    # pages with too little text get no vector. Returns the number of requests
+    vectors = [None] * len(pages)
+    todo = [n for n, text in enumerate(embed_texts) if text]
+    if todo:
+        with INGEST_STAGE_SECONDS.labels(stage="embed").time():
+            try:
+                for n, embedding in zip(todo, get_embeddings([embed_texts[n] for n in todo])):
+                    vectors[n] = embedding
+            except Exception as e:
+                record_error("embed")
+                log.warning("embedding failed", extra={"pdf": filename, "pages": len(todo), "error": str(e)})
+    for page, embedding in zip(pages, vectors):
+        set_page_embedding(page, embedding)
+    return math.ceil(len(todo) / EMBED_BATCH_SIZE)
+
 @app.post("/upload")
 @app.post("/upload_pdf/")
 async def upload_pdf(
     file: UploadFile = File(...),
-    vision_on_upload: str = Form("false")
+    vision_on_upload: str = Form("false"),
+    replace: str = Form("false")
 ):
+    tmp_location = None
     try:
         os.makedirs("uploads", exist_ok=True)
         filename = os.path.basename(file.filename)
         original_path = file.filename
         file_location = f"uploads/{filename}"
-        with open(file_location, "wb") as f_out:
+        # The stored PDF is only swapped in once its rows are committed; a failed
+        # replace must not leave the old rows pointing at a file that is gone
+        fd, tmp_location = tempfile.mkstemp(dir="uploads", prefix=f".{filename}.", suffix=".part")
+        with os.fdopen(fd, "wb") as f_out:
             content = await file.read()
             f_out.write(content)
 
         try:
-            doc = fitz.open(file_location)
+            doc = fitz.open(tmp_location)
         except Exception as e:
-            print(f"PyMuPDF failed to open {filename}: {e}")
+            log.warning("pdf open failed", extra={"pdf": filename, "error": str(e)})
             raise HTTPException(status_code=400, detail=f"PDF parsing failed: {e}")
 
         session = get_session()
+        # The rows are only read back by this request after committing (vision, index update);
+        # keeping them loaded avoids one SELECT per page and relationship
+        session.expire_on_commit = False
         num_pages = doc.page_count
-        pages_processed = 0
         preview_urls = []
         preview_texts = []
-
+        classifications = []
+        changed_pages = []
+        tag_pages = []
+        moved_pages = []  # unchanged content, new upload path
+        reembed_pages = []
+        reembed_texts = []
+
+        # --- Replace in place: reuse rows whose page content is unchanged ---
+        existing = {}
+        stale_pages = []
+        if replace and replace.lower() == "true":
+            # Text and vector are read or rewritten for most pages; load them up front
+            old_pages = session.exec(
+                select(Page).where(Page.pdf_name == filename).order_by(Page.id)
+                .options(selectinload(Page.content), selectinload(Page.vector))
+            ).all()
+            for old in old_pages:
+                if old.page_number in existing or old.page_number > num_pages:
+                    stale_pages.append(old)  # duplicate upload or page no longer in the PDF
+                else:
+                    existing[old.page_number] = old
+
+        raw_texts, content_hashes = [], []
         for i in range(num_pages):
-            page_obj = doc[i]
-            raw_text = page_obj.get_text()
-            text = clean_pdf_text(raw_text)
-            images = page_obj.get_images(full=True)
-            is_image_heavy = len(images) > 0
+            with INGEST_STAGE_SECONDS.labels(stage="extract").time():
+                raw_texts.append(doc[i].get_text())
+                content_hashes.append(page_content_hash(doc[i], raw_texts[i]))
+        # Whole document at once, so running headers/footers can be spotted across pages
+        with INGEST_STAGE_SECONDS.labels(stage="clean_local").time():
+            clean_texts = clean_pages(raw_texts)
 
-            # --- AI Cleaning & Tag Generation ---
-            try:
-                cleaned_text, ai_tags = clean_text_and_generate_tags(text)
-            except Exception as e:
-                print(f"AI cleaning/tagging failed for {filename}, page {i+1}: {e}")
-                cleaned_text, ai_tags = text, []
+        for i in range(num_pages):
+            page_obj, raw_text, content_hash = doc[i], raw_texts[i], content_hashes[i]
+
+            page = existing.get(i + 1)
+            if page and page.content_hash == content_hash:
+                if page.pdf_path != original_path:
+                    if move_page(page, original_path):
+                        text = page.content.text if page.content else ""
+                        summary = page.content.vision_summary if page.content else None
+                        tags = page.tags.split(",") if page.tags else []
+                        reembed_pages.append(page)
+                        reembed_texts.append(page_embed_text(text, tags) or page_embed_text(summary, tags))
+                    session.add(page)
+                    moved_pages.append(page)
+                preview_urls.append(f"http://localhost:8000/previews/{filename}-page{i+1}.png")
+                preview_texts.append(page.content.text if page.content else "")
+                continue
 
-            # --- Folder tags ---
-            folder_tags = []
-            if original_path and ("/" in original_path or "\\" in original_path):
-                folders = os.path.dirname(original_path).replace("\\", "/").split("/")
-                folder_tags = [f for f in folders if f]
-
-            tags = list(set(ai_tags + folder_tags))
-            if is_image_heavy:
-                tags.append("image_heavy")
-
-            # --- Embedding Logic ---
-            embed_text = cleaned_text
-            if tags:
-                embed_text = embed_text.strip() + "\n[tags: " + ", ".join(tags) + "]"
-            if embed_text and len(embed_text.strip()) > 10:
-                try:
-                    embedding = get_embedding(embed_text)
-                except Exception as e:
-                    print(f"Embedding failed for {filename}, page {i+1}: {e}")
-                    embedding = None
-            else:
-                embedding = None
-
-            page = Page(
-                pdf_name=filename,
-                pdf_path=original_path,
-                page_number=i + 1,
-                text=cleaned_text,  # <--- Save cleaned text!
-                embedding=",".join(map(str, embedding)) if embedding else None,
-                tags=",".join(tags) if tags else None,
+            if page is None:
+                page = Page(pdf_name=filename, page_number=i + 1)
+            page.content_hash = content_hash
+            classification, preview_url, needs_tags = ingest_page(
+                page, page_obj, raw_text, clean_texts[i], original_path
             )
             session.add(page)
-            pages_processed += 1
-
-            # Generate preview image
-            try:
-                from pdf_preview import render_page_preview
-                render_page_preview(file_location, i + 1)
-                preview_url = f"http://localhost:8000/previews/{filename}-page{i+1}.png"
-                preview_urls.append(preview_url)
-            except Exception as e:
-                print(f"Failed to generate preview for page {i+1}: {e}")
-                preview_urls.append(None)
+            changed_pages.append(page)
+            if needs_tags:
+                tag_pages.append(page)
+            classifications.append(classification)
+            preview_urls.append(preview_url)
+            preview_texts.append(page.content.text)
+
+        # Paid calls this upload makes, reported next to the routing
+        api_calls = {"clean_tag": sum(c["route"] == ROUTE_LLM_CLEAN for c in classifications), "vision": 0}
+        api_calls["tag"] = tag_document_pages(filename, tag_pages)
+        embed_texts = [
+            page_embed_text(p.content.text, p.tags.split(",") if p.tags else []) for p in changed_pages
+        ]
+        api_calls["embed"] = embed_document_pages(
+            filename, changed_pages + reembed_pages, embed_texts + reembed_texts
+        )
 
-            preview_texts.append(cleaned_text)
+        # Rows, vectors and previews of the old version go in the same commit
+        stale_ids = [p.id for p in stale_pages]
+        stale_numbers = {p.page_number for p in stale_pages if p.page_number > num_pages}
+        for old in stale_pages:
+            session.delete(old)
 
-        session.commit()
-        print(f"Successfully processed {pages_processed}/{num_pages} pages in {filename}")
+        with INGEST_STAGE_SECONDS.labels(stage="db_commit").time():
+            session.commit()
+        doc.close()
+        os.replace(tmp_location, file_location)
 
         # --- Vision on upload (for image_heavy pages only) ---
         if vision_on_upload and vision_on_upload.lower() == "true":
-            print(f"Vision processing all image_heavy pages for {filename}...")
-            for i in range(num_pages):
-                page = session.exec(
-                    select(Page).where((Page.pdf_name == filename) & (Page.page_number == i + 1))
-                ).first()
-                if not page or not page.tags or "image_heavy" not in page.tags:
+            log.info("vision processing image_heavy pages", extra={"pdf": filename})
+            for page in changed_pages:
+                if not page.tags or "image_heavy" not in page.tags:
                     continue
-                if getattr(page, "vision_summary", None):
+                if page.content.vision_summary:
                     continue  # already processed
-                preview_path = f"uploads/previews/{filename}-page{i+1}.png"
+                preview_path = preview_path_for(filename, page.page_number)
                 if os.path.exists(preview_path):
-                    prompt = vision_context_prompt(page.tags, page.text, extra_context="Elementary worksheet page.")
+                    prompt = vision_context_prompt(page.tags, page.content.text, extra_context="Elementary worksheet page.")
                     try:
-                        vision_output = run_vision_model(preview_path, prompt)
-                        page.vision_summary = vision_output
+                        api_calls["vision"] += 1
+                        with INGEST_STAGE_SECONDS.labels(stage="vision").time():
+                            vision_output = run_vision_model(preview_path, prompt)
+                        page.content.vision_summary = vision_output
                         session.add(page)
-                        session.commit()
-                        print(f"Vision processed page {i+1} in {filename}")
+                        log.info("vision processed", extra={"pdf": filename, "page": page.page_number})
                     except Exception as e:
-                        print(f"Vision failed for {filename} page {i+1}: {e}")
-
-        # --- Update FAISS index for all pages in DB ---
-        global index
-        index.clear()
-        all_pages = session.exec(select(Page)).all()
-        for page in all_pages:
-            if page.embedding:
-                embedding = list(map(float, page.embedding.split(",")))
-                index.add(page, embedding)
+                        record_error("vision")
+                        log.warning("vision failed", extra={"pdf": filename, "page": page.page_number, "error": str(e)})
+            with INGEST_STAGE_SECONDS.labels(stage="db_commit").time():
+                session.commit()
+
+        report = routing_report(classifications, api_calls)
+        log.info("pdf processed", extra={
+            "pdf": filename, "pages_processed": len(changed_pages), "page_count": num_pages,
+            "pages_unchanged": num_pages - len(changed_pages), "pages_removed": len(stale_pages),
+            "pages_moved": len(moved_pages),
+            "routing": report["counts"], "api_calls": report["api_calls"],
+        })
+
+        # --- Update FAISS index for the pages that changed or moved to another partition ---
+        with INGEST_STAGE_SECONDS.labels(stage="index_update").time():
+            updated = changed_pages + moved_pages
+            index.remove(stale_ids + [p.id for p in updated if not p.vector])
+            indexed = [p for p in updated if p.vector]
+            if indexed:
+                index.add_many(
+                    [p.id for p in indexed],
+                    np.vstack([parse_embedding(p.vector.embedding) for p in indexed]),
+                    [page_partition(p) for p in indexed],
+                )
+        # Only now, or a /search in between would cache a ranking of the old index under the new version
+        if changed_pages or stale_pages or moved_pages:
+            bump_data_version()
+        remove_previews(filename, stale_numbers)
 
         return {
             "filename": filename,
             "page_count": num_pages,
+            "pages_processed": len(changed_pages),
+            "pages_removed": len(stale_pages),
+            "pages_moved": len(moved_pages),
             "previews": preview_urls,
-            "pages": preview_texts
+            "pages": preview_texts,
+            "routing": report
         }
 
     except Exception as e:
-        print(f"Error in upload_pdf for {file.filename}: {e}")
+        record_error("upload")
+        log.exception("upload failed", extra={"pdf": file.filename})
         raise HTTPException(status_code=500, detail=f"Upload failed for {file.filename}: {e}")
+    finally:
+        if tmp_location and os.path.exists(tmp_location):
+            os.remove(tmp_location)
 
 
 class TagUpdate(BaseModel):
@@ -234,135 +547,198 @@ def update_tags(page_id: int, update: TagUpdate):
     tag_list = [t.strip().lower() for t in (update.tags or "").split(",") if t.strip()]
     page.tags = ",".join(tag_list)
     # --- RECOMPUTE EMBEDDING WITH NEW TAGS ---
-    embed_text = page.text or ""
-    if tag_list:
-        embed_text = embed_text.strip() + "\n[tags: " + ", ".join(tag_list) + "]"
-    if embed_text and len(embed_text.strip()) > 10:
+    embed_text = page_embed_text(page.content.text if page.content else "", tag_list)
+    embedding = None
+    if embed_text:
         try:
             embedding = get_embedding(embed_text)
-            page.embedding = ",".join(map(str, embedding)) if embedding else None
         except Exception as e:
-            print(f"Embedding update failed for page {page_id}: {e}")
-            page.embedding = None
-    else:
-        page.embedding = None
+            record_error("embed")
+            log.warning("embedding update failed", extra={"page_id": page_id, "error": str(e)})
+    set_page_embedding(page, embedding)
 
     session.add(page)
     session.commit()
 
     # --- UPDATE FAISS IN-MEMORY INDEX ---
     try:
-        global index
-        idx_to_update = None
-        for idx, (pid, _) in enumerate(index.page_map):
-            if pid == page_id:
-                idx_to_update = idx
-                break
-        if idx_to_update is not None:
-            index.index.remove_ids(np.array([idx_to_update], dtype=np.int64))
-            index.page_map.pop(idx_to_update)
-        if page.embedding:
-            new_embedding = list(map(float, page.embedding.split(",")))
-            index.add(page, new_embedding)
-        print(f"FAISS index updated for page {page_id}")
+        index_page(page)
+        log.info("faiss index updated", extra={"page_id": page_id})
     except Exception as e:
-        print(f"FAISS index update failed for page {page_id}: {e}")
+        record_error("index_update")
+        log.warning("faiss index update failed", extra={"page_id": page_id, "error": str(e)})
+    bump_data_version()
 
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/tags")
 def list_all_tags():
     session = get_session()
-    pages = session.exec(select(Page)).all()
+    tag_strings = session.exec(select(Page.tags).where(Page.tags != None).distinct()).all()
     tag_set = set()
-    for p in pages:
-        if p.tags:
-            tags = [t.strip().lower() for t in p.tags.split(",") if t.strip()]
-            tag_set.update(tags)
+    for tag_str in tag_strings:
+        tags = [t.strip().lower() for t in tag_str.split(",") if t.strip()]
+        tag_set.update(tags)
     # Sort alphabetically, case-insensitive (capital letters first)
     return sorted(tag_set, key=lambda s: s.lower())
 
 @app.get("/search")
-def search_pages(q: str = Query(...), tag: Optional[str] = None):
+@SEARCH_SECONDS.time()
+def search_pages(
+    q: str = Query(...),
+    tag: Optional[str] = None,
+    folder: Optional[str] = None,
+    fields: str = SEARCH_DEFAULT_FIELDS,
+    limit: int = Query(SEARCH_PAGE_LIMIT, ge=1, le=500),
+    cursor: int = Query(0, ge=0),
+    snippet_chars: int = Query(SNIPPET_CHARS, ge=20, le=5000),
+):
+    selected = parse_fields(fields)
     session = get_session()
 
+    cache_key = (q, tag, folder, data_version())
+    ranked = search_cache.get(cache_key)
+    if ranked is None:
+        ranked = rank_pages(session, q, tag, folder)
+        search_cache.put(cache_key, ranked)
+
+    page = ranked[cursor:cursor + limit]
+    next_cursor = cursor + limit if cursor + limit < len(ranked) else None
+
+    # Text comes from the side table, only for the pages being returned
+    contents = page_contents(session, [r["page_id"] for r in page], selected)
+    pattern = query_pattern(q) if "snippet" in selected else None
+    results = [
+        project_result(r, contents.get(r["page_id"]), selected, pattern, snippet_chars)
+        for r in page
+    ]
+    return paged_response(results, next_cursor)
+
+def search_partitions(session, folder, tag):
+    partitions = index.scope(folder, tag)
+    if partitions is not None and folder:
+        # The folder filter also matches deeper down ("grade 1/unit 2/"), in other partitions
+        path = func.replace(Page.pdf_path, "\\", "/")
+        if session.exec(select(Page.id).where(path.like(f"%/{folder}/%")).limit(1)).first() is not None:
+            return None
+    return partitions
+
+def rank_pages(session, q, tag, folder=None):
     query_context = q
     if "grade" not in q.lower():
         query_context += " for early elementary education"
 
-    query_embedding = get_embedding(query_context)
-    seeds = index.search(query_embedding, top_k=10)
+    with SEARCH_STAGE_SECONDS.labels(stage="embed").time():
+        query_embedding = get_embedding(query_context)
+    # A folder (or grade tag) filter only has to scan its own partition
+    partitions = search_partitions(session, folder, tag)
+    with SEARCH_STAGE_SECONDS.labels(stage="faiss").time():
+        seeds = index.search(query_embedding, top_k=10, partitions=partitions)
 
     visited = set()
     scored_results = []
 
+    listing_columns = (Page.id, Page.pdf_name, Page.page_number, Page.tags)
+    seed_ids = [r["page_id"] for r in seeds]
+    seed_rows = {
+        row[0]: row for row in session.exec(
+            filter_pages(select(*listing_columns).where(Page.id.in_(seed_ids)), folder=folder)
+        )
+    }
+
     # Direct FAISS results with score 1.0
-    for r in seeds:
-        page = session.exec(select(Page).where(Page.id == r["page_id"])).first()
-        if page and page.id not in visited:
-            if tag and tag.lower() not in (page.tags or "").lower():
+    for page_id in seed_ids:
+        row = seed_rows.get(page_id)
+        if row and page_id not in visited:
+            if tag and tag.lower() not in (row[3] or "").lower():
                 continue
             scored_results.append({
-                "page_id": page.id,
-                "text": page.text,
-                "pdf_name": page.pdf_name,
-                "page_number": page.page_number,
-                "tags": page.tags or "",
+                "page_id": page_id,
+                "pdf_name": row[1],
+                "page_number": row[2],
+                "tags": row[3] or "",
                 "score": 1.0
             })
-            visited.add(page.id)
+            visited.add(page_id)
 
     # Graph-style expansion: 1-hop neighbors via shared tags, score = 0.6
-    for r in seeds:
-        base_page = session.exec(select(Page).where(Page.id == r["page_id"])).first()
-        if not base_page or not base_page.tags:
-            continue
-        tagset = set([t.strip().lower() for t in (base_page.tags or "").split(",")])
-
-        candidates = session.exec(select(Page)).all()
-        for p in candidates:
-            if p.id in visited or p.id == base_page.id:
-                continue
-            if not p.embedding:
-                continue
-            if tag and tag.lower() not in (p.tags or "").lower():
+    with SEARCH_STAGE_SECONDS.labels(stage="expansion").time():
+        candidates = session.exec(
+            filter_pages(select(*listing_columns), folder=folder)
+            .where(Page.tags != None)
+            .where(Page.id.in_(select(PageEmbedding.page_id)))
+        ).all()
+        for page_id in seed_ids:
+            base_page = seed_rows.get(page_id)
+            if not base_page or not base_page[3]:
                 continue
+            tagset = set([t.strip().lower() for t in (base_page[3] or "").split(",")])
+
+            for p_id, p_pdf, p_number, p_tags_str in candidates:
+                if p_id in visited or p_id == page_id:
+                    continue
+                if tag and tag.lower() not in (p_tags_str or "").lower():
+                    continue
 
-            p_tags = set([t.strip().lower() for t in (p.tags or "").split(",")])
-            overlap = tagset & p_tags
-            if overlap:
-                scored_results.append({
-                    "page_id": p.id,
-                    "text": p.text,
-                    "pdf_name": p.pdf_name,
-                    "page_number": p.page_number,
-                    "tags": p.tags or "",
-                    "score": 0.6
-                })
-                visited.add(p.id)
-
-    sorted_results = sorted(scored_results, key=lambda x: x["score"], reverse=True)
-    return sorted_results
+                p_tags = set([t.strip().lower() for t in (p_tags_str or "").split(",")])
+                overlap = tagset & p_tags
+                if overlap:
+                    scored_results.append({
+                        "page_id": p_id,
+                        "pdf_name": p_pdf,
+                        "page_number": p_number,
+                        "tags": p_tags_str or "",
+                        "score": 0.6
+                    })
+                    visited.add(p_id)
+
+    return sorted(scored_results, key=lambda x: x["score"], reverse=True)
 
 @app.get("/files")
 def list_uploaded_files():
     session = get_session()
-    result = session.exec(select(Page)).all()
-    file_info = {}
-
-    for page in result:
-        key = page.pdf_name
-        if key not in file_info:
-            file_info[key] = {
-                "pdf_name": key,
-                "page_count": 0,
-                "image_heavy_count": 0
-            }
-        file_info[key]["page_count"] += 1
-        if "image-heavy" in (page.tags or ""):
-            file_info[key]["image_heavy_count"] += 1
-
-    return list(file_info.values())
+    result = session.exec(
+        select(
+            Page.pdf_name,
+            func.count().label("page_count"),
+            func.sum(case((Page.tags.like("%image_heavy%"), 1), else_=0)).label("image_heavy_count")
+        ).group_by(Page.pdf_name).order_by(func.min(Page.id))
+    ).all()
+    return [
+        {"pdf_name": r[0], "page_count": r[1], "image_heavy_count": r[2] or 0}
+        for r in result
+    ]
+
+@app.delete("/files/{pdf_name}")
+def delete_file(pdf_name: str, key: str = Depends(check_admin)):
+    session = get_session()
+    rows = session.exec(
+        select(Page.id, Page.page_number).where(Page.pdf_name == pdf_name)
+    ).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="PDF not found")
+    page_ids = [r[0] for r in rows]
+
+    # All rows for the file go in one transaction; the index and files follow the commit
+    session.exec(delete(PageContent).where(PageContent.page_id.in_(page_ids)))
+    session.exec(delete(PageEmbedding).where(PageEmbedding.page_id.in_(page_ids)))
+    session.exec(delete(Page).where(Page.pdf_name == pdf_name))
+    session.commit()
+
+    vectors_removed = index.remove(page_ids)
+    bump_data_version()
+    remove_previews(pdf_name, {r[1] for r in rows})
+    pdf_path = UPLOAD_DIR / os.path.basename(pdf_name)
+    if pdf_path.exists():
+        pdf_path.unlink()
+
+    log.info("pdf deleted", extra={"pdf": pdf_name, "pages": len(page_ids), "vectors": vectors_removed})
+    return {"status": "ok", "pdf_name": pdf_name, "pages_deleted": len(page_ids), "vectors_removed": vectors_removed}
 
 @app.get("/pages/{page_id}")
 def get_page(page_id: int):
@@ -370,28 +746,60 @@ def get_page(page_id: int):
     page = session.get(Page, page_id)
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
-    return page
+    return {
+        "id": page.id,
+        "pdf_name": page.pdf_name,
+        "pdf_path": page.pdf_path,
+        "page_number": page.page_number,
+        "tags": page.tags,
+        "text": page.content.text if page.content else "",
+        "vision_summary": page.content.vision_summary if page.content else None,
+        "has_embedding": page.vector is not None,
+    }
 
 @app.get("/pages_by_pdf")
-def get_pages_by_pdf(pdf_name: str):
+def get_pages_by_pdf(
+    pdf_name: str,
+    fields: str = PAGES_DEFAULT_FIELDS,
+    limit: int = Query(200, ge=1, le=5000),
+    cursor: Optional[str] = Query(None, pattern=r"^\d+:\d+$"),
+    snippet_chars: int = Query(500, ge=20, le=5000),
+):
+    selected = parse_fields(fields)
     session = get_session()
-    pages = session.exec(select(Page).where(Page.pdf_name == pdf_name)).all()
-    return [
-        {
-            "page_id": p.id,
-            "text": p.text,
-            "page_number": p.page_number,
-            "tags": p.tags or "",
-            "vision_summary": p.vision_summary
-        }
-        for p in pages
+
+    # Keyset pagination on (page_number, id); the cursor is "page_number:id" of the last row sent
+    query = select(Page.id, Page.pdf_name, Page.page_number, Page.tags).where(Page.pdf_name == pdf_name)
+    if cursor:
+        after_number, after_id = map(int, cursor.split(":"))
+        query = query.where(
+            (Page.page_number > after_number)
+            | ((Page.page_number == after_number) & (Page.id > after_id))
+        )
+    rows = session.exec(query.order_by(Page.page_number, Page.id).limit(limit + 1)).all()
+    next_cursor = f"{rows[limit - 1][2]}:{rows[limit - 1][0]}" if len(rows) > limit else None
+    rows = rows[:limit]
+
+    contents = page_contents(session, [r[0] for r in rows], selected)
+    results = [
+        project_result(
+            {"page_id": r[0], "pdf_name": r[1], "page_number": r[2], "tags": r[3] or "", "score": None},
+            contents.get(r[0]), selected, snippet_chars=snippet_chars,
+        )
+        for r in rows
     ]
+    return paged_response(results, next_cursor)
 
 @app.post("/export_pages")
 def export_selected_pages(payload: ExportRequest):
     session = get_session()
     ordered_ids = payload.order or payload.page_ids
-    pages = [session.get(Page, pid) for pid in ordered_ids if pid is not None]
+    rows = {
+        r[0]: r for r in session.exec(
+            select(Page.id, Page.pdf_name, Page.page_number).where(Page.id.in_(ordered_ids))
+        )
+    }
+    pages = [rows.get(pid) for pid in ordered_ids if pid is not None]
 
     pdf_writer = fitz.open()
 
@@ -402,11 +810,13 @@ def export_selected_pages(payload: ExportRequest):
         title_page.insert_text((72, 150), payload.title, fontsize=24, fontname="helv")
         pdf_writer.insert_pdf(title_doc)
 
+    src_docs = {}
     for page in pages:
         if page:
-            src_path = UPLOAD_DIR / page.pdf_name
-            src_doc = fitz.open(src_path)
-            pdf_writer.insert_pdf(src_doc, from_page=page.page_number - 1, to_page=page.page_number - 1)
+            _, pdf_name, page_number = page
+            if pdf_name not in src_docs:
+                src_docs[pdf_name] = fitz.open(UPLOAD_DIR / pdf_name)
+            pdf_writer.insert_pdf(src_docs[pdf_name], from_page=page_number - 1, to_page=page_number - 1)
 
     temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
     pdf_writer.save(temp_file.name)
@@ -415,27 +825,45 @@ def export_selected_pages(payload: ExportRequest):
     return FileResponse(temp_file.name, filename="exported_pages.pdf", media_type="application/pdf")
 
 @app.get("/graph")
-def get_graph():
+def get_graph(
+    request: Request,
+    pdf: Optional[str] = None,
+    tag: Optional[str] = None,
+    folder: Optional[str] = None,
+    mode: str = Query("pages", pattern="^(pages|summary)$"),
+    limit: int = Query(GRAPH_PAGE_LIMIT, ge=1, le=10000),
+    cursor: Optional[int] = None,
+    max_tag_degree: int = Query(GRAPH_MAX_TAG_DEGREE, ge=1),
+    max_tags: int = Query(200, ge=1),
+    max_edges: int = Query(1000, ge=0),
+):
+    params = {
+        "pdf": pdf, "tag": tag, "folder": folder, "mode": mode, "limit": limit, "cursor": cursor,
+        "max_tag_degree": max_tag_degree, "max_tags": max_tags, "max_edges": max_edges,
+    }
+    etag = graph_etag(params)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    cached = graph_cache.get(etag)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers=headers)
+
     session = get_session()
-    pages = session.exec(select(Page)).all()
-    nodes = []
-    edges = []
-    tag_index = {}
-
-    # Add page nodes
-    for p in pages:
-        nodes.append({
-            "data": {"id": f"page-{p.id}", "label": f"Page {p.page_number}", "type": "page", "pdf": p.pdf_name} })
-
-        if p.tags:
-            for tag in [t.strip().lower() for t in p.tags.split(",") if t.strip()]:
-                tag_id = f"tag-{tag}"
-                if tag_id not in tag_index:
-                    nodes.append({"data": {"id": tag_id, "label": tag, "type": "tag"}})
-                    tag_index[tag_id] = True
-                edges.append({"data": {"source": f"page-{p.id}", "target": tag_id}})
-
-    return JSONResponse(content={"nodes": nodes, "edges": edges})
+    if mode == "summary":
+        rows = session.exec(filter_pages(select(Page.tags), pdf, tag, folder)).all()
+        body = json.dumps(summary_graph([(t,) for t in rows], max_tags, max_edges)).encode("utf-8")
+        graph_cache.put(etag, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # Keyset pagination on page id: fetch one extra row to know if there is more
+    query = filter_pages(select(Page.id, Page.page_number, Page.pdf_name, Page.tags), pdf, tag, folder)
+    if cursor is not None:
+        query = query.where(Page.id > cursor)
+    rows = session.exec(query.order_by(Page.id).limit(limit + 1)).all()
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    chunks = stream_page_graph(rows[:limit], next_cursor, max_tag_degree)
+    return StreamingResponse(graph_cache.caching(etag, chunks), media_type="application/json", headers=headers)
 
 @app.get("/render_preview/")
 def render_preview(pdf_name: str = Query(...), page: int = Query(...)):
@@ -445,29 +873,44 @@ def render_preview(pdf_name: str = Query(...), page: int = Query(...)):
     image_path = render_page_preview(pdf_path, page)
     return FileResponse(image_path)
 
-def clean_pdf_text(text):
-    # 1. Collapse "vertical" letter stacks: C\nH\nA\nP\nT\nE\nR\n3 => CHAPTER 3
-    def fix_vertical(match):
-        return ''.join(line.strip() for line in match.group(0).split('\n') if line.strip()) + '\n'
-    text = re.sub(r'((?:^[A-Z0-9]\n){2,})', fix_vertical, text, flags=re.MULTILINE)
-    
-    # 2. Replace 2+ newlines with just one (normalize spacing)
-    text = re.sub(r'\n{2,}', '\n', text)
-    
-    # 3. Optionally, collapse single newlines in middle of sentences (for extra aggressive cleaning)
-    # text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)
-    
-    return text.strip()
-
 @app.post("/admin/generate_previews")
 def admin_generate_previews(key: str = Depends(check_admin)):
-    try:
-        result = subprocess.run(
-            ["python", "scripts/generate_previews.py"], capture_output=True, text=True, check=True
-        )
-        return {"status": "ok", "output": result.stdout}
-    except Exception as e:
-        return {"status": "error", "error": str(e)}
+    return admin_start_maintenance("previews", key=key)
+
+@app.get("/admin/maintenance")
+def admin_maintenance_status(key: str = Depends(check_admin)):
+    return maintenance.job_status()
+
+@app.post("/admin/maintenance/{job}")
+def admin_start_maintenance(job: str, restart: bool = False, key: str = Depends(check_admin)):
+    # Runs on a background thread in this process, so new vectors go straight into the live index
+    if job not in maintenance.JOBS:
+        raise HTTPException(status_code=404, detail=f"Unknown job, expected one of {sorted(maintenance.JOBS)}")
+    started = maintenance.start_job(job, index=index, restart=restart)
+    return {"status": "started" if started else "already_running", "job": job}
+
+@app.post("/admin/maintenance/{job}/stop")
+def admin_stop_maintenance(job: str, key: str = Depends(check_admin)):
+    stopping = maintenance.stop_job(job)
+    return {"status": "stopping" if stopping else "not_running", "job": job}
+
+@app.get("/admin/index/partitions")
+def admin_index_partitions(key: str = Depends(check_admin)):
+    return {"partition_by": index.partition_by, "partitions": index.partitions()}
+
+@app.post("/admin/index/partitions/{partition}/load")
+def admin_load_partition(partition: str, key: str = Depends(check_admin)):
+    if not index.load(partition):
+        raise HTTPException(status_code=404, detail="Partition not found")
+    return {"status": "ok", "partition": partition, "loaded": True}
+
+@app.post("/admin/index/partitions/{partition}/unload")
+def admin_unload_partition(partition: str, key: str = Depends(check_admin)):
+    # Frees the memory; the next search or upload touching the partition reads it back from disk
+    if partition not in index.sizes:
+        raise HTTPException(status_code=404, detail="Partition not found")
+    index.unload(partition)
+    return {"status": "ok", "partition": partition, "loaded": False}
 
 @app.post("/admin/ingest_folder")
 def admin_ingest_folder(key: str = Depends(check_admin)):
@@ -495,6 +938,7 @@ def admin_reset_pages(key: str = Depends(check_admin)):
             output += "\nFAISS index cleared."
         else:
             output += "\nWarning: FAISS index not found in globals."
+        bump_data_version()
 
         # 3. Clear graph (if you have one)
         global graph  # assumes you have a graph object globally
@@ -507,7 +951,7 @@ def admin_reset_pages(key: str = Depends(check_admin)):
         else:
             output += "\n(No graph object found—skipping graph reset.)"
 
-        print(output)
+        log.info("pages reset", extra={"output": output})
         return {"status": "ok", "output": output}
 
     except Exception as e:
@@ -561,8 +1005,9 @@ def admin_embedding_status():
         select(
             Page.pdf_name,
             func.count().label("total"),
-            func.sum(case((Page.embedding == None, 1), else_=0)).label("missing")
-        ).group_by(Page.pdf_name)
+            func.sum(case((PageEmbedding.page_id == None, 1), else_=0)).label("missing")
+        ).join(PageEmbedding, PageEmbedding.page_id == Page.id, isouter=True)
+        .group_by(Page.pdf_name)
     ).all()
     return [{"pdf_name": r[0], "total": r[1], "missing": r[2]} for r in result]
 
@@ -576,10 +1021,9 @@ def vision_annotate(page_id: int):
     if not os.path.exists(preview_path):
         raise HTTPException(status_code=404, detail="Preview image not found")
 
-    prompt = vision_context_prompt(page.tags, page.text, extra_context="Elementary worksheet page.")
+    prompt = vision_context_prompt(page.tags, page.content.text if page.content else "", extra_context="Elementary worksheet page.")
 
     vision_output = run_vision_model(preview_path, prompt)
-    import json
     summary, vision_tags = "", []
     try:
         content = vision_output.strip()
@@ -591,11 +1035,11 @@ def vision_annotate(page_id: int):
         summary = data.get("vision_summary", "").strip()
         vision_tags = [t.strip() for t in data.get("tags", "").split(",") if t.strip()]
     except Exception as e:
-        print("Could not parse vision output JSON, using raw output as summary:", e)
+        log.warning("vision output is not JSON, using raw output as summary", extra={"page_id": page_id, "error": str(e)})
         summary = vision_output.strip()
         vision_tags = []
 
-    page.vision_summary = summary
+    set_page_text(page, vision_summary=summary)
 
     # --- Merge tags ---
     tags_set = set([t.strip() for t in (page.tags or "").split(",") if t.strip()])
@@ -604,6 +1048,7 @@ def vision_annotate(page_id: int):
 
     session.add(page)
     session.commit()
+    bump_data_version()
 
     return {"status": "ok", "vision_summary": summary, "tags": vision_tags}
 
@@ -613,23 +1058,21 @@ def update_vision_summary(page_id: int, summary: str = Body(...)):
     page = session.get(Page, page_id)
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
-    page.vision_summary = summary
+    set_page_text(page, vision_summary=summary)
 
     # --- Re-embed using vision summary + tags! ---
-    embed_text = summary
-    tag_list = page.tags.split(",") if page.tags else []
-    if tag_list:
-        embed_text += "\n[tags: " + ", ".join(tag_list) + "]"
-    if embed_text and len(embed_text.strip()) > 10:
+    embed_text = page_embed_text(summary, page.tags.split(",") if page.tags else [])
+    embedding = None
+    if embed_text:
         try:
             embedding = get_embedding(embed_text)
-            page.embedding = ",".join(map(str, embedding)) if embedding else None
         except Exception as e:
-            print(f"Embedding failed for page {page_id}: {e}")
-            page.embedding = None
-    else:
-        page.embedding = None
+            record_error("embed")
+            log.warning("embedding failed", extra={"page_id": page_id, "error": str(e)})
+    set_page_embedding(page, embedding)
 
     session.add(page)
     session.commit()
+    index_page(page)
+    bump_data_version()
     return {"status": "ok"}
\ No newline at end of file
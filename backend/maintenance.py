@@ -0,0 +1,250 @@
+# backend/maintenance.py
+#
+# In-process maintenance jobs over the whole library:
+#   reembed  - embed pages with no vector, or one made by another EMBEDDING_MODEL
+#   tags     - backfill folder tags for untagged pages (and re-embed them)
+#   previews - render missing page preview PNGs
+# Jobs walk pages in id order, MAINTENANCE_CHUNK_SIZE at a time, and commit each
+# chunk together with a MaintenanceRun checkpoint. A stopped or failed job picks
+# up after the last committed chunk. The pause between chunks leaves room for
+# live requests (SQLite has a single writer).
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import fitz  # PyMuPDF
+import numpy as np
+from sqlmodel import select, func, or_
+
+from database import get_session
+from data_version import bump_data_version
+from embedding import get_embeddings, page_embed_text, EMBEDDING_MODEL
+from log_config import get_logger
+from metrics import MAINTENANCE_PAGES
+from models import Page, PageContent, PageEmbedding, MaintenanceRun
+from pdf_preview import preview_path_for, save_page_preview
+
+log = get_logger(__name__)
+
+MAINTENANCE_CHUNK_SIZE = int(os.environ.get("MAINTENANCE_CHUNK_SIZE", "200"))
+MAINTENANCE_PAUSE_SECONDS = float(os.environ.get("MAINTENANCE_PAUSE_SECONDS", "0.5"))
+UPLOAD_DIR = "uploads"
+
+
+def folder_tags(path: str) -> list:
+    parts = Path((path or "").replace("\\", "/")).parts[:-1]  # drop the file name
+    return [p for p in parts if p and p != "/" and "." not in p]
+
+
+def embed_pages(session, rows):
+    # rows: (page_id, text, vision_summary, tag_list, pdf_path); one batched embedding call per chunk.
+    # Returns (page_ids, vectors, partition_sources) of the pages that got a new embedding,
+    # partition_sources being the (pdf_path, tags) PageIndex.partition_for needs.
+    todo = []
+    for page_id, text, summary, tags, pdf_path in rows:
+        # Image pages carry little text; their vision summary describes them better
+        embed_text = page_embed_text(text, tags) or page_embed_text(summary, tags)
+        if embed_text:
+            todo.append((page_id, embed_text, (pdf_path, ",".join(tags))))
+    if not todo:
+        return [], [], []
+    vectors = get_embeddings([t for _, t, _ in todo])
+    ids = [page_id for page_id, _, _ in todo]
+    existing = {
+        e.page_id: e for e in session.exec(select(PageEmbedding).where(PageEmbedding.page_id.in_(ids)))
+    }
+    for page_id, vector in zip(ids, vectors):
+        row = existing.get(page_id) or PageEmbedding(page_id=page_id)
+        row.embedding = ",".join(map(str, vector))
+        row.model = EMBEDDING_MODEL
+        session.add(row)
+    return ids, vectors, [source for _, _, source in todo]
+
+
+def reembed_chunk(session, after_id, limit):
+    rows = session.exec(
+        select(Page.id, PageContent.text, PageContent.vision_summary, Page.tags, Page.pdf_path, Page.pdf_name)
+        .join(PageContent, PageContent.page_id == Page.id, isouter=True)
+        .join(PageEmbedding, PageEmbedding.page_id == Page.id, isouter=True)
+        .where(Page.id > after_id)
+        .where(func.coalesce(PageEmbedding.model, "") != EMBEDDING_MODEL)
+        .order_by(Page.id)
+        .limit(limit)
+    ).all()
+    pages = [(r[0], r[1], r[2], [t for t in (r[3] or "").split(",") if t], r[4] or r[5]) for r in rows]
+    embedded = embed_pages(session, pages)
+    return [r[0] for r in rows], len(embedded[0]), embedded
+
+
+def tags_chunk(session, after_id, limit):
+    rows = session.exec(
+        select(Page.id, Page.pdf_name, Page.pdf_path, PageContent.text, PageContent.vision_summary)
+        .join(PageContent, PageContent.page_id == Page.id, isouter=True)
+        .where(Page.id > after_id)
+        .where(or_(Page.tags == None, Page.tags == ""))
+        .order_by(Page.id)
+        .limit(limit)
+    ).all()
+    tagged, embedded = [], ([], [], [])
+    for page_id, pdf_name, pdf_path, text, summary in rows:
+        tags = folder_tags(pdf_path or pdf_name)
+        if tags:
+            tagged.append((page_id, text, summary, tags, pdf_path or pdf_name))
+    if tagged:
+        pages = {p.id: p for p in session.exec(select(Page).where(Page.id.in_([t[0] for t in tagged])))}
+        for page_id, _, _, tags, _ in tagged:
+            pages[page_id].tags = ",".join(tags)
+            session.add(pages[page_id])
+        # Tags are part of the embedded text, so the vectors go stale with them
+        embedded = embed_pages(session, tagged)
+    return [r[0] for r in rows], len(tagged), embedded
+
+
+def previews_chunk(session, after_id, limit):
+    rows = session.exec(
+        select(Page.id, Page.pdf_name, Page.page_number)
+        .where(Page.id > after_id)
+        .order_by(Page.id)
+        .limit(limit)
+    ).all()
+    docs = {}
+    rendered = 0
+    try:
+        for _, pdf_name, page_number in rows:
+            if os.path.exists(preview_path_for(pdf_name, page_number)):
+                continue
+            pdf_path = os.path.join(UPLOAD_DIR, os.path.basename(pdf_name))
+            if pdf_name not in docs:
+                docs[pdf_name] = fitz.open(pdf_path) if os.path.exists(pdf_path) else None
+            doc = docs[pdf_name]
+            if doc is None or page_number > doc.page_count:
+                continue
+            save_page_preview(doc, pdf_name, page_number)
+            rendered += 1
+    finally:
+        for doc in docs.values():
+            if doc is not None:
+                doc.close()
+    return [r[0] for r in rows], rendered, ([], [], [])
+
+
+JOBS = {
+    "reembed": reembed_chunk,
+    "tags": tags_chunk,
+    "previews": previews_chunk,
+}
+
+_stop_events = {}
+_jobs_lock = threading.Lock()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def job_status(session=None) -> list:
+    session = session or get_session()
+    runs = {r.job: r for r in session.exec(select(MaintenanceRun))}
+    return [
+        {
+            "job": job,
+            "running": job in _stop_events,
+            **(runs[job].model_dump(exclude={"job"}) if job in runs else {"status": "idle"}),
+        }
+        for job in JOBS
+    ]
+
+
+def run_job(job: str, index=None, restart: bool = False, stop_event=None,
+            chunk_size: int = MAINTENANCE_CHUNK_SIZE, pause: float = MAINTENANCE_PAUSE_SECONDS):
+    if job not in JOBS:
+        raise ValueError(f"Unknown maintenance job {job!r}, expected one of {sorted(JOBS)}")
+    process_chunk = JOBS[job]
+    session = get_session()
+    run = session.get(MaintenanceRun, job) or MaintenanceRun(job=job)
+    if restart or run.status == "done":
+        run.last_page_id, run.updated, run.skipped = 0, 0, 0
+    run.status, run.error, run.updated_at = "running", None, _now()
+    session.add(run)
+    session.commit()
+    log.info("maintenance started", extra={"job": job, "after_id": run.last_page_id})
+
+    try:
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                run.status = "stopped"
+                break
+            page_ids, updated, (vector_ids, vectors, sources) = process_chunk(session, run.last_page_id, chunk_size)
+            if not page_ids:
+                run.status = "done"
+                break
+            run.last_page_id = page_ids[-1]
+            run.updated += updated
+            run.skipped += len(page_ids) - updated
+            run.updated_at = _now()
+            session.add(run)
+            session.commit()  # the chunk and its checkpoint land together
+
+            if vector_ids and index is not None and len(vectors[0]) == index.dim:
+                partitions = [index.partition_for(path, tags) for path, tags in sources]
+                index.add_many(vector_ids, np.array(vectors, dtype="float32"), partitions)
+            if updated and job != "previews":
+                bump_data_version()
+            MAINTENANCE_PAGES.labels(job=job, outcome="updated").inc(updated)
+            MAINTENANCE_PAGES.labels(job=job, outcome="skipped").inc(len(page_ids) - updated)
+            if pause:
+                time.sleep(pause)
+    except Exception as e:
+        session.rollback()
+        run = session.get(MaintenanceRun, job)
+        run.status, run.error = "error", str(e)
+        log.warning("maintenance failed", extra={"job": job, "after_id": run.last_page_id, "error": str(e)})
+    run.updated_at = _now()
+    session.add(run)
+    session.commit()
+    session.refresh(run)
+    result = run.model_dump()
+    session.close()
+    log.info("maintenance finished", extra=result)
+    return result
+
+
+def start_job(job: str, index=None, restart: bool = False) -> bool:
+    # Runs the job on a background thread; False if it is already running
+    if job not in JOBS:
+        raise ValueError(f"Unknown maintenance job {job!r}, expected one of {sorted(JOBS)}")
+    with _jobs_lock:
+        if job in _stop_events:
+            return False
+        _stop_events[job] = threading.Event()
+
+    def target():
+        try:
+            run_job(job, index, restart, _stop_events[job])
+        finally:
+            with _jobs_lock:
+                _stop_events.pop(job, None)
+
+    threading.Thread(target=target, name=f"maintenance-{job}", daemon=True).start()
+    return True
+
+
+def stop_job(job: str) -> bool:
+    # The job stops after the chunk it is working on; start it again to resume
+    with _jobs_lock:
+        event = _stop_events.get(job)
+    if event is None:
+        return False
+    event.set()
+    return True
+
+
+if __name__ == "__main__":
+    # python maintenance.py reembed|tags|previews [--restart]
+    if len(sys.argv) < 2 or sys.argv[1] not in JOBS:
+        sys.exit(f"usage: python maintenance.py {{{'|'.join(JOBS)}}} [--restart]")
+    print(run_job(sys.argv[1], restart="--restart" in sys.argv[2:]))
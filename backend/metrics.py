@@ -0,0 +1,149 @@
+# backend/metrics.py
+#
+# Prometheus metrics for ingest, search and the external OpenAI calls.
+# Exposed as text at GET /metrics (see main.py).
+
+import os
+import time
+
+import openai
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+from log_config import get_logger
+from request_profile import record_api_call
+
+log = get_logger(__name__)
+
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+OPENAI_RETRY_BACKOFF = float(os.environ.get("OPENAI_RETRY_BACKOFF", "0.5"))
+
+# Errors worth another attempt; everything else is raised straight away
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+INGEST_STAGE_SECONDS = Histogram(
+    "edudocs_ingest_stage_seconds",
+    "Time spent per ingest stage",
+    # Per page: extract, classify, clean_tag, tag, preview, vision.
+    # Per upload: clean_local, embed, db_commit, index_update
+    ["stage"],
+)
+INGEST_PAGES = Counter(
+    "edudocs_ingest_pages_total",
+    "Pages ingested, by classifier route",
+    ["route"],
+)
+INGEST_TEXT_TOKENS = Counter(
+    "edudocs_ingest_text_tokens_total",
+    "Estimated tokens of page text before and after local cleaning",
+    ["kind"],  # raw, cleaned
+)
+SEARCH_STAGE_SECONDS = Histogram(
+    "edudocs_search_stage_seconds",
+    "Time spent per search stage",
+    ["stage"],  # embed, faiss, expansion
+)
+SEARCH_SECONDS = Histogram(
+    "edudocs_search_seconds",
+    "End-to-end /search latency",
+)
+API_CALLS = Counter(
+    "edudocs_api_calls_total",
+    "External API calls",
+    ["service", "outcome"],  # service: embedding, chat, vision; outcome: ok, error
+)
+API_CALL_SECONDS = Histogram(
+    "edudocs_api_call_seconds",
+    "External API call latency, including retries",
+    ["service"],
+)
+API_RETRIES = Counter(
+    "edudocs_api_retries_total",
+    "External API calls retried after a retryable error",
+    ["service"],
+)
+API_TOKENS = Counter(
+    "edudocs_api_tokens_total",
+    "Tokens reported by the API",
+    ["service", "kind"],  # kind: prompt, completion
+)
+MAINTENANCE_PAGES = Counter(
+    "edudocs_maintenance_pages_total",
+    "Pages handled by maintenance jobs",
+    ["job", "outcome"],  # outcome: updated, skipped
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "edudocs_request_sql_statements",
+    "SQL statements run per HTTP request; a high count points at an N+1 query",
+    ["route"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250, 1000),
+)
+ERRORS = Counter(
+    "edudocs_errors_total",
+    "Errors swallowed on the ingest and search paths",
+    ["stage"],
+)
+INDEX_VECTORS = Gauge(
+    "edudocs_index_vectors",
+    "Vectors in the FAISS index",
+)
+INDEX_BYTES = Gauge(
+    "edudocs_index_bytes",
+    "Approximate memory held by loaded FAISS vectors",
+)
+INDEX_PARTITIONS = Gauge(
+    "edudocs_index_partitions",
+    "FAISS index partitions",
+    ["state"],  # loaded, unloaded
+)
+
+
+def track_index(page_index):
+    INDEX_VECTORS.set_function(lambda: page_index.ntotal)
+    INDEX_BYTES.set_function(lambda: page_index.loaded_vectors * page_index.dim * 4)
+    INDEX_PARTITIONS.labels(state="loaded").set_function(lambda: len(page_index.loaded))
+    INDEX_PARTITIONS.labels(state="unloaded").set_function(lambda: len(page_index.sizes) - len(page_index.loaded))
+
+
+def record_error(stage: str):
+    ERRORS.labels(stage=stage).inc()
+
+
+def call_api(service: str, create, **kwargs):
+    # The clients are built with max_retries=0 so every retry is counted here
+    start = time.perf_counter()
+    attempt = 0
+    try:
+        while True:
+            try:
+                response = create(**kwargs)
+                break
+            except RETRYABLE_ERRORS as e:
+                if attempt >= OPENAI_MAX_RETRIES:
+                    raise
+                attempt += 1
+                API_RETRIES.labels(service=service).inc()
+                log.warning("api call retry", extra={"service": service, "attempt": attempt, "error": str(e)})
+                time.sleep(OPENAI_RETRY_BACKOFF * (2 ** (attempt - 1)))
+    except Exception:
+        API_CALLS.labels(service=service, outcome="error").inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        API_CALL_SECONDS.labels(service=service).observe(elapsed)
+        record_api_call(elapsed)
+
+    API_CALLS.labels(service=service, outcome="ok").inc()
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        API_TOKENS.labels(service=service, kind="prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+        API_TOKENS.labels(service=service, kind="completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+    return response
+
+
+def render_metrics():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,12 +1,45 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
 
+# Page holds only the small listing metadata. The heavy per-page data lives in
+# side tables so that /files, /graph, /tags etc. never read it off disk.
 class Page(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    pdf_name: str
+    pdf_name: str = Field(index=True)
     pdf_path: Optional[str] = None   # <--- add this line!
     page_number: int
-    text: str
     tags: Optional[str] = None
-    embedding: Optional[str] = None
+    content_hash: Optional[str] = None  # sha256 of page text + image digests, for replace uploads
+
+    content: Optional["PageContent"] = Relationship(
+        back_populates="page",
+        sa_relationship_kwargs={"uselist": False, "cascade": "all, delete-orphan"},
+    )
+    vector: Optional["PageEmbedding"] = Relationship(
+        back_populates="page",
+        sa_relationship_kwargs={"uselist": False, "cascade": "all, delete-orphan"},
+    )
+
+class PageContent(SQLModel, table=True):
+    page_id: Optional[int] = Field(default=None, foreign_key="page.id", primary_key=True)
+    text: str = ""
     vision_summary: Optional[str] = None
+
+    page: Optional[Page] = Relationship(back_populates="content")
+
+class PageEmbedding(SQLModel, table=True):
+    page_id: Optional[int] = Field(default=None, foreign_key="page.id", primary_key=True)
+    embedding: str  # comma-separated floats
+    model: Optional[str] = None  # embedding.EMBEDDING_MODEL that produced it
+
+    page: Optional[Page] = Relationship(back_populates="vector")
+
+class MaintenanceRun(SQLModel, table=True):
+    # Checkpoint of a maintenance job (see maintenance.py); a stopped job resumes after last_page_id
+    job: str = Field(primary_key=True)
+    status: str = "idle"  # running, stopped, done, error
+    last_page_id: int = 0
+    updated: int = 0
+    skipped: int = 0
+    error: Optional[str] = None
+    updated_at: Optional[str] = None
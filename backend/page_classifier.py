@@ -0,0 +1,105 @@
+# backend/page_classifier.py
+#
+# Cheap, CPU-only routing of PDF pages before any paid API call.
+# Every page ends up in one of three buckets:
+#   skip      - text is already clean (or there is none); keep the local cleanup
+#   llm_clean - text is noisy enough to be worth the LLM cleanup/tagging call
+#   vision    - the page is mostly pictures; tag it image_heavy for the vision pass
+# With TAG_CLEAN_PAGES on, skip and vision pages that have text still get topic
+# tags from a tag-only call (llm_helpers.generate_tags) that covers TAG_BATCH_PAGES
+# pages at a time, so a clean document costs one call, not one per page. Vision pages get
+# their vision summary only when uploaded with vision_on_upload=true or later
+# through /pages/{id}/vision_annotate, which also merges in tags from the picture.
+
+import os
+import string
+
+ROUTE_SKIP = "skip"
+ROUTE_LLM_CLEAN = "llm_clean"
+ROUTE_VISION = "vision"
+ROUTES = (ROUTE_SKIP, ROUTE_LLM_CLEAN, ROUTE_VISION)
+
+# Fraction of the page area covered by images before we consider it a picture page
+VISION_MIN_IMAGE_COVERAGE = float(os.environ.get("VISION_MIN_IMAGE_COVERAGE", "0.35"))
+# ...as long as there is not much text on it (non-space chars per 1000 pt^2)
+VISION_MAX_TEXT_DENSITY = float(os.environ.get("VISION_MAX_TEXT_DENSITY", "1.0"))
+# Pages with fewer characters than this have nothing worth cleaning
+MIN_TEXT_CHARS = int(os.environ.get("CLASSIFIER_MIN_TEXT_CHARS", "20"))
+# Share of odd characters (symbols, replacement chars, ...) that triggers LLM cleanup
+LLM_MIN_NOISE_RATIO = float(os.environ.get("LLM_MIN_NOISE_RATIO", "0.05"))
+# Share of 1-2 character lines (vertical letter stacks, broken layout) that triggers LLM cleanup
+LLM_MIN_SHORT_LINE_RATIO = float(os.environ.get("LLM_MIN_SHORT_LINE_RATIO", "0.3"))
+
+# Tag-only LLM call for pages that skip the cleanup call; off means folder tags only
+TAG_CLEAN_PAGES = os.environ.get("TAG_CLEAN_PAGES", "true").lower() == "true"
+
+_CLEAN_CHARS = set(string.ascii_letters + string.digits + ".,;:!?'\"()-+=/%$&*#@[]<>_")
+
+
+def image_coverage(page_obj) -> float:
+    page_rect = page_obj.rect
+    page_area = abs(page_rect.width * page_rect.height)
+    if not page_area:
+        return 0.0
+    covered = 0.0
+    for info in page_obj.get_image_info():
+        bbox = page_rect & info["bbox"]  # clip to the visible page
+        if not bbox.is_empty:
+            covered += abs(bbox.width * bbox.height)
+    # Overlapping images can add up to more than the page
+    return min(covered / page_area, 1.0)
+
+
+def text_metrics(text: str) -> dict:
+    chars = [c for c in text if not c.isspace()]
+    n_chars = len(chars)
+    noisy = sum(1 for c in chars if c not in _CLEAN_CHARS and not c.isalnum())
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    short_lines = sum(1 for line in lines if len(line) <= 2)
+    return {
+        "chars": n_chars,
+        "noise_ratio": noisy / n_chars if n_chars else 0.0,
+        "short_line_ratio": short_lines / len(lines) if lines else 0.0,
+    }
+
+
+def classify_page(page_obj, text: str) -> dict:
+    # `text` is the locally cleaned text (text_cleaning.clean_pages): letter stacks it
+    # already joined must not send the page to the LLM
+    metrics = text_metrics(text)
+    coverage = image_coverage(page_obj)
+    page_area = abs(page_obj.rect.width * page_obj.rect.height)
+    density = metrics["chars"] * 1000.0 / page_area if page_area else 0.0
+
+    if coverage >= VISION_MIN_IMAGE_COVERAGE and density < VISION_MAX_TEXT_DENSITY:
+        route = ROUTE_VISION
+    elif metrics["chars"] < MIN_TEXT_CHARS:
+        route = ROUTE_SKIP
+    elif (metrics["noise_ratio"] >= LLM_MIN_NOISE_RATIO
+          or metrics["short_line_ratio"] >= LLM_MIN_SHORT_LINE_RATIO):
+        route = ROUTE_LLM_CLEAN
+    else:
+        route = ROUTE_SKIP
+
+    return {
+        "route": route,
+        "image_coverage": round(coverage, 3),
+        "text_density": round(density, 3),
+        "noise_ratio": round(metrics["noise_ratio"], 3),
+        "short_line_ratio": round(metrics["short_line_ratio"], 3),
+    }
+
+
+def routing_report(classifications: list, api_calls: dict = None) -> dict:
+    # api_calls: paid requests made per service, e.g. {"clean_tag": 2, "tag": 1, "embed": 1, "vision": 0}
+    counts = {route: 0 for route in ROUTES}
+    for c in classifications:
+        counts[c["route"]] += 1
+    api_calls = api_calls or {}
+    return {
+        "counts": counts,
+        "llm_cleanups_skipped": counts[ROUTE_SKIP] + counts[ROUTE_VISION],
+        "api_calls": api_calls,
+        "paid_calls": sum(api_calls.values()),
+        "pages": classifications,
+    }
@@ -1,14 +1,19 @@
 import fitz  # PyMuPDF
 import os
 
-def render_page_preview(pdf_path, page_num, output_dir="uploads/previews", dpi=120):
+PREVIEW_DIR = "uploads/previews"
+
+def preview_path_for(pdf_name, page_num, output_dir=PREVIEW_DIR):
+    return os.path.join(output_dir, f"{os.path.basename(pdf_name)}-page{page_num}.png")
+
+def save_page_preview(doc, pdf_name, page_num, output_dir=PREVIEW_DIR, dpi=120):
+    # Renders from an already open document, so callers can reuse it across pages
     os.makedirs(output_dir, exist_ok=True)
-    doc = fitz.open(pdf_path)
-    page = doc[page_num - 1]
-    pix = page.get_pixmap(dpi=dpi)
-    output_path = os.path.join(
-        output_dir,
-        f"{os.path.basename(pdf_path)}-page{page_num}.png"
-    )
+    pix = doc[page_num - 1].get_pixmap(dpi=dpi)
+    output_path = preview_path_for(pdf_name, page_num, output_dir)
     pix.save(output_path)
     return output_path
+
+def render_page_preview(pdf_path, page_num, output_dir=PREVIEW_DIR, dpi=120):
+    with fitz.open(pdf_path) as doc:
+        return save_page_preview(doc, pdf_path, page_num, output_dir, dpi)
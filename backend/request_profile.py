@@ -0,0 +1,156 @@
+# backend/request_profile.py
+#
+# Per-request cost breakdown: SQL statements, external API calls and FAISS time.
+# The HTTP middleware in main.py opens a RequestStats for every request; the
+# SQLAlchemy event hooks, metrics.call_api and PageIndex add to it. Requests
+# slower than SLOW_REQUEST_MS are logged with the breakdown, and a sampled
+# share of them (PROFILE_SAMPLE_RATE) also gets a cProfile dump in PROFILE_DIR.
+
+import cProfile
+import contextvars
+import functools
+import inspect
+import io
+import os
+import pstats
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_TOP_FUNCTIONS = 15
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self, profile: bool = False):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.api_count = 0
+        self.api_seconds = 0.0
+        self.faiss_count = 0
+        self.faiss_seconds = 0.0
+        self.profile = cProfile.Profile() if profile else None
+
+    def summary(self) -> dict:
+        return {
+            "duration_ms": round((time.perf_counter() - self.start) * 1000, 1),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_seconds * 1000, 1),
+            "api_count": self.api_count,
+            "api_ms": round(self.api_seconds * 1000, 1),
+            "faiss_count": self.faiss_count,
+            "faiss_ms": round(self.faiss_seconds * 1000, 1),
+        }
+
+
+def current_stats():
+    # None outside a request, e.g. on maintenance threads or at startup
+    return _current.get()
+
+
+def start_request(profile: bool = False):
+    stats = RequestStats(profile)
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def should_profile() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def record_api_call(seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.api_count += 1
+        stats.api_seconds += seconds
+
+
+@contextmanager
+def faiss_timer():
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.faiss_count += 1
+            stats.faiss_seconds += time.perf_counter() - start
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_seconds += time.perf_counter() - start
+
+
+def log_request(stats: RequestStats, method: str, path: str, status: int):
+    summary = stats.summary()
+    if summary["duration_ms"] < SLOW_REQUEST_MS:
+        return
+    extra = {"method": method, "path": path, "status": status, **summary}
+    if stats.profile is not None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{method}-{path.strip('/').replace('/', '_') or 'root'}.prof"
+        extra["profile"] = os.path.join(PROFILE_DIR, name)
+        stats.profile.dump_stats(extra["profile"])
+        out = io.StringIO()
+        pstats.Stats(stats.profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        extra["profile_top"] = out.getvalue()
+    log.warning("slow request", extra=extra)
+
+
+class ProfiledRoute(APIRoute):
+    # Sync endpoints run on a worker thread and cProfile only sees its own thread,
+    # so the profiler is switched on inside the endpoint rather than in the middleware
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+def _profiled(endpoint):
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            stats = _current.get()
+            if stats is None or stats.profile is None:
+                return await endpoint(*args, **kwargs)
+            stats.profile.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                stats.profile.disable()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            stats = _current.get()
+            if stats is None or stats.profile is None:
+                return endpoint(*args, **kwargs)
+            stats.profile.enable()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                stats.profile.disable()
+    return wrapper
@@ -1,8 +1,10 @@
 from database import get_session
-from models import Page
+from models import Page, PageContent, PageEmbedding
 
 def clear_pages():
     session = get_session()
+    session.query(PageContent).delete()
+    session.query(PageEmbedding).delete()
     count = session.query(Page).delete()
     session.commit()
     print(f"🧹 Deleted {count} pages from the database.")
@@ -1,30 +1,18 @@
 # scripts/backfill_tags_from_paths.py
+# Same as POST /admin/maintenance/tags; resumes from its checkpoint
+# Usage (from backend/, where pages.db lives): python scripts/backfill_tags_from_paths.py
+import sys
 from pathlib import Path
-from sqlmodel import select
-from database import get_session
-from models import Page
 
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
 
-def backfill_tags():
-    session = get_session()
-    pages = session.exec(select(Page)).all()
-    updated = 0
-
-    for page in pages:
-        if page.tags:
-            continue  # Skip already tagged pages
+from maintenance import run_job  # noqa: E402
 
-        try:
-            parts = Path(page.pdf_name).parts[:-1]  # Exclude actual filename
-            tags = [p for p in parts if "." not in p]  # Filter out non-informative parts
-            page.tags = ", ".join(tags)
-            session.add(page)
-            updated += 1
-        except Exception as e:
-            print(f"Failed to process: {page.pdf_name} — {e}")
 
-    session.commit()
-    print(f"✅ Backfilled tags for {updated} pages.")
+def backfill_tags():
+    result = run_job("tags")
+    print(f"✅ Backfilled tags for {result['updated']} pages ({result['status']}).")
 
 
 if __name__ == "__main__":
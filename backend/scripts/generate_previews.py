@@ -1,20 +1,14 @@
-import fitz
-import os
+# scripts/generate_previews.py
+# Same as POST /admin/maintenance/previews; only missing previews are rendered
+# Usage (from backend/, where pages.db lives): python scripts/generate_previews.py
+import sys
+from pathlib import Path
 
-uploads_dir = "uploads"
-previews_dir = os.path.join(uploads_dir, "previews")
-os.makedirs(previews_dir, exist_ok=True)
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
 
-for fname in os.listdir(uploads_dir):
-    if fname.endswith(".pdf"):
-        pdf_path = os.path.join(uploads_dir, fname)
-        doc = fitz.open(pdf_path)
-        for i in range(doc.page_count):
-            page = doc[i]
-            pix = page.get_pixmap(dpi=120)
-            out_name = f"{fname}-page{i+1}.png"
-            out_path = os.path.join(previews_dir, out_name)
-            if not os.path.exists(out_path):
-                pix.save(out_path)
-                print(f"Saved {out_path}")
+from maintenance import run_job  # noqa: E402
+
+result = run_job("previews")
+print(f"Rendered {result['updated']} previews ({result['status']}).")
 print("Done.")
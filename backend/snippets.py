@@ -0,0 +1,50 @@
+# backend/snippets.py
+#
+# Short, highlighted excerpts of page text for /search and /pages_by_pdf.
+# Highlights are [start, end) offsets into the snippet so the UI can mark
+# them without the server sending HTML.
+
+import re
+
+SNIPPET_CHARS = 240
+_WORD_RE = re.compile(r"\w+")
+_SPACE_RE = re.compile(r"\s+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "for", "in", "is", "of", "on", "or", "the", "to", "with",
+    "early", "elementary", "education",  # added to every query in search_pages
+}
+
+
+def query_pattern(query: str):
+    # One compiled pattern per request, matching any query term at a word start
+    terms = sorted({t for t in _WORD_RE.findall(query.lower()) if len(t) > 1 and t not in _STOPWORDS},
+                   key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE)
+
+
+def make_snippet(text: str, pattern=None, width: int = SNIPPET_CHARS):
+    text = _SPACE_RE.sub(" ", text or "").strip()
+    if not text:
+        return "", []
+    matches = [m.span() for m in pattern.finditer(text)] if pattern else []
+
+    start = 0
+    if matches and len(text) > width:
+        # Window that starts a little before the match with the most matches after it
+        best = max(matches, key=lambda span: sum(1 for s, _ in matches if span[0] <= s < span[0] + width))
+        start = max(0, best[0] - width // 4)
+        if start:
+            space = text.find(" ", start)
+            start = space + 1 if 0 <= space < best[0] else start
+    end = min(len(text), start + width)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+
+    prefix = "…" if start > 0 else ""
+    snippet = prefix + text[start:end] + ("…" if end < len(text) else "")
+    offset = len(prefix) - start
+    highlights = [[s + offset, e + offset] for s, e in matches if s >= start and e <= end]
+    return snippet, highlights
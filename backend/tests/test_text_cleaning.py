@@ -0,0 +1,40 @@
+# tests/test_text_cleaning.py
+#
+# Usage (from backend/): python -m pytest tests
+
+import random
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bench.make_corpus import worksheet_text, TOPICS  # noqa: E402
+from text_cleaning import clean_pages  # noqa: E402
+
+
+def _lines(texts):
+    # clean_pages collapses runs of spaces
+    return [[" ".join(line.split()) for line in text.splitlines()] for text in texts]
+
+
+def test_worksheet_content_is_kept():
+    for topic in TOPICS:
+        rng = random.Random(0)
+        pages = [worksheet_text(rng, topic) for _ in range(6)]
+        assert _lines(clean_pages(pages)) == _lines(pages)
+
+
+def test_running_header_and_footer_are_removed():
+    rng = random.Random(1)
+    bodies = [worksheet_text(rng, "addition") for _ in range(6)]
+    pages = [
+        f"Math Workbook - Page {n + 1}\n{body}\nPage {n + 1} of 6\n© 2024 Example Press"
+        for n, body in enumerate(bodies)
+    ]
+    assert _lines(clean_pages(pages)) == _lines(bodies)
+
+
+def test_short_documents_are_not_stripped():
+    pages = ["Page 1 of 2\nColor the circles.", "Page 2 of 2\nColor the squares."]
+    assert clean_pages(pages) == pages
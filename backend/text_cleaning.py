@@ -0,0 +1,130 @@
+# backend/text_cleaning.py
+#
+# Deterministic, local cleanup of extracted PDF text, run before any API call.
+# clean_pages() takes every page of one document at once: each pass is a single
+# precompiled regex over the whole document, and running headers and footers
+# are dropped: a line at the same top or bottom position on most pages that
+# carries a changing page number ("Page 3 of 12") or a copyright/URL notice.
+# Lines that repeat unchanged, like a worksheet's title and instructions, and
+# drill lines like "1. 19 + 9 = ____" are content and stay.
+
+import math
+import os
+import re
+from collections import Counter
+
+# Lines at each end of a page that are checked for running headers/footers
+HEADER_FOOTER_LINES = int(os.environ.get("HEADER_FOOTER_LINES", "3"))
+# Share of the document's pages a line must repeat on to count as a header/footer
+HEADER_FOOTER_MIN_SHARE = float(os.environ.get("HEADER_FOOTER_MIN_SHARE", "0.5"))
+HEADER_FOOTER_MIN_PAGES = 3  # fewer pages can't tell a header from content
+
+# Pages are joined with this while cleaning; no pattern below can match across it
+_PAGE_SEP = "\n\f\n"
+
+_TRANSLATE = str.maketrans({
+    "\r": "\n",
+    "\f": "\n",
+    "\u00a0": " ",   # no-break space
+    "\u00ad": None,  # soft hyphen
+    "\u200b": None,  # zero-width space
+    "\ufb00": "ff", "\ufb01": "fi", "\ufb02": "fl", "\ufb03": "ffi", "\ufb04": "ffl",
+    "\u2010": "-", "\u2011": "-",
+    "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+})
+# Vertical letter stacks: C\nH\nA\nP\nT\nE\nR => CHAPTER
+_VERTICAL_RE = re.compile(r"((?:^[A-Z0-9]\n){2,})", re.MULTILINE)
+# Word broken across lines: "multi-\nplication" => "multiplication"
+_HYPHEN_RE = re.compile(r"(?<=[a-z])-\n(?=[a-z])")
+_SPACES_RE = re.compile(r"[ \t\v]+")
+_EDGE_SPACES_RE = re.compile(r" *\n *")
+_BLANK_LINES_RE = re.compile(r"\n{2,}")
+_DIGITS_RE = re.compile(r"\d+")
+_LETTERS_RE = re.compile(r"[^\W\d_]")
+_BOILERPLATE_RE = re.compile(r"\u00a9|\(c\)|copyright|all rights reserved|https?://|www\.|\.com\b", re.IGNORECASE)
+_WORD_RE = re.compile(r"\w+")
+
+
+def _fix_vertical(match):
+    return "".join(line.strip() for line in match.group(0).split("\n") if line.strip()) + "\n"
+
+
+def _line_key(line: str) -> str:
+    # "Page 3 of 12" and "Page 4 of 12" are the same footer
+    return _DIGITS_RE.sub("#", line.lower())
+
+
+def _is_wordy(line: str) -> bool:
+    # Numbers, operators and answer blanks are exercise content, never a header
+    return len(_LETTERS_RE.findall(line)) * 2 >= len(line.replace(" ", ""))
+
+
+def _edge_positions(lines: list) -> list:
+    # ("top", 0) is the first line, ("bottom", 0) the last
+    n = min(HEADER_FOOTER_LINES, len(lines))
+    return [(("top", i), lines[i]) for i in range(n)] + [(("bottom", i), lines[-1 - i]) for i in range(n)]
+
+
+def _repeated_edge_lines(pages: list) -> set:
+    # (position, key) pairs that are running headers/footers
+    if len(pages) < HEADER_FOOTER_MIN_PAGES:
+        return set()
+    seen = Counter()
+    variants = {}
+    for lines in pages:
+        page_keys = Counter(_line_key(line) for line in lines)
+        for position, line in _edge_positions(lines):
+            key = _line_key(line)
+            if page_keys[key] > 1 or not _is_wordy(line):
+                continue  # a pattern repeated within the page is content
+            seen[position, key] += 1
+            variants.setdefault((position, key), set()).add(line)
+    min_pages = max(2, math.ceil(HEADER_FOOTER_MIN_SHARE * len(pages)))
+    return {
+        edge for edge, count in seen.items()
+        if count >= min_pages and (len(variants[edge]) > 1 or _BOILERPLATE_RE.search(edge[1]))
+    }
+
+
+def _strip_edges(lines: list, repeated: set) -> list:
+    start, end = 0, len(lines)
+    while start < min(HEADER_FOOTER_LINES, end) and (("top", start), _line_key(lines[start])) in repeated:
+        start += 1
+    while (end > max(start, len(lines) - HEADER_FOOTER_LINES)
+           and (("bottom", len(lines) - end), _line_key(lines[end - 1])) in repeated):
+        end -= 1
+    return lines[start:end] or lines  # a page that is all "header" is probably content
+
+
+def clean_pages(texts: list) -> list:
+    if not texts:
+        return []
+    text = _PAGE_SEP.join(t.translate(_TRANSLATE) for t in texts)
+    text = _SPACES_RE.sub(" ", text)
+    text = _EDGE_SPACES_RE.sub("\n", text)
+    text = _VERTICAL_RE.sub(_fix_vertical, text)
+    text = _HYPHEN_RE.sub("", text)
+    text = _BLANK_LINES_RE.sub("\n", text)
+    pages = [[line.strip() for line in page.split("\n") if line.strip()] for page in text.split("\f")]
+
+    repeated = _repeated_edge_lines(pages)
+    if repeated:
+        pages = [_strip_edges(lines, repeated) for lines in pages]
+    return ["\n".join(lines) for lines in pages]
+
+
+def estimate_tokens(text: str) -> int:
+    # Close to tiktoken for English prose: ~4 characters or ~3/4 of a word per token
+    if not text:
+        return 0
+    return math.ceil(max(len(_WORD_RE.findall(text)) * 4 / 3, len(text) / 4))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4]
+    while cut and estimate_tokens(cut) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
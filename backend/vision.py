@@ -3,6 +3,11 @@ import base64
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from metrics import call_api
+from log_config import get_logger
+
+log = get_logger(__name__)
+
 load_dotenv()
 
 AZURE_OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
@@ -14,6 +19,7 @@ client = OpenAI(
     api_key=AZURE_OPENAI_API_KEY,
     base_url=f"{OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_VISION_DEPLOYMENT}/",
     default_query={"api-version": AZURE_OPENAI_API_VERSION},
+    max_retries=0,  # retries are counted in metrics.call_api
 )
 
 def run_vision_model(image_path: str, prompt: str) -> str:
@@ -23,16 +29,17 @@ def run_vision_model(image_path: str, prompt: str) -> str:
         {"type": "text", "text": prompt},
         {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}},
     ]
-    response = client.chat.completions.create(
+    response = call_api(
+        "vision",
+        client.chat.completions.create,
         model=AZURE_OPENAI_VISION_DEPLOYMENT,
         messages=[{"role": "user", "content": content}],
         max_tokens=512,
     )
-    print("Full vision API response:", response)  # <--- Put this line here!
     try:
         return response.choices[0].message.content
     except Exception:
-        print("No valid choices or message in response:", response)
+        log.warning("vision response has no message", extra={"image": image_path, "response_id": getattr(response, "id", None)})
         return ""
     
 def vision_context_prompt(tags, extracted_text, extra_context=None):
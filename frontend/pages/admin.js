@@ -5,6 +5,8 @@ const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
 
 const actions = [
   { name: "Generate Image Previews", endpoint: "/admin/generate_previews" },
+  { name: "Re-embed Missing / Outdated Pages", endpoint: "/admin/maintenance/reembed" },
+  { name: "Backfill Tags From Folders", endpoint: "/admin/maintenance/tags" },
   { name: "Bulk Ingest PDFs", endpoint: "/admin/ingest_folder" },
   { name: "Reset (Clear) Pages DB", endpoint: "/admin/reset_pages" },
 ];
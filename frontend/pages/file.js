@@ -11,22 +11,31 @@ export default function FileDetailPage() {
   const [tags, setTags] = useState({});
   const [loading, setLoading] = useState(true);
   const [visionLoading, setVisionLoading] = useState({});
+  const [nextCursor, setNextCursor] = useState(null);
 
-  useEffect(() => {
-    if (!name) return;
-    fetch(`${API_BASE}/pages_by_pdf?pdf_name=${encodeURIComponent(name)}`)
-      .then((res) => res.json())
+  const loadPages = (cursor) => {
+    const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : "";
+    return fetch(`${API_BASE}/pages_by_pdf?pdf_name=${encodeURIComponent(name)}${cursorParam}`)
+      .then((res) => {
+        setNextCursor(res.headers.get("X-Next-Cursor"));
+        return res.json();
+      })
       .then((data) => {
-        setPages(data);
+        setPages((prev) => (cursor ? [...prev, ...data] : data));
         const tagMap = {};
         data.forEach((p) => (tagMap[p.page_id] = p.tags || ""));
-        setTags(tagMap);
+        setTags((prev) => (cursor ? { ...prev, ...tagMap } : tagMap));
         setLoading(false);
       })
       .catch((err) => {
         console.error("Failed to fetch pages", err);
         setLoading(false);
       });
+  };
+
+  useEffect(() => {
+    if (!name) return;
+    loadPages(null);
   }, [name]);
 
   const handleTagChange = (pageId, value) => {
@@ -118,9 +127,7 @@ export default function FileDetailPage() {
                     </div>
                   ) : (
                     <p className="text-sm text-gray-700 whitespace-pre-wrap mb-2 flex-1">
-                      {page.text && page.text.length > 500
-                        ? page.text.slice(0, 500) + "..."
-                        : page.text || <span className="italic text-gray-400">No extracted text available.</span>}
+                      {page.snippet || <span className="italic text-gray-400">No extracted text available.</span>}
                     </p>
                   )}
                 </div>
@@ -149,6 +156,14 @@ export default function FileDetailPage() {
                 </div>
               </div>
             ))}
+            {nextCursor && (
+              <button
+                onClick={() => loadPages(nextCursor)}
+                className="w-full text-sm bg-gray-200 hover:bg-gray-300 text-gray-800 px-4 py-2 rounded"
+              >
+                Load more pages
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -2,6 +2,8 @@
 import { useEffect, useState } from 'react';
 import Link from 'next/link';
 
+const ADMIN_KEY = "devkey"; // Set to match backend or use from env
+
 export default function FilesPage() {
   const [files, setFiles] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -20,6 +22,19 @@ export default function FilesPage() {
       });
   }, []);
 
+  const handleDelete = async (pdfName) => {
+    if (!confirm(`Delete ${pdfName} and all of its pages?`)) return;
+    try {
+      const res = await fetch(`${API_BASE}/files/${encodeURIComponent(pdfName)}?key=${ADMIN_KEY}`, {
+        method: "DELETE",
+      });
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      setFiles((prev) => prev.filter((f) => f.pdf_name !== pdfName));
+    } catch (err) {
+      console.error("Failed to delete file", err);
+    }
+  };
+
   return (
     <main className="min-h-screen bg-gray-50 flex flex-col items-center px-4 py-8">
       <div className="w-full max-w-2xl">
@@ -46,12 +61,20 @@ export default function FilesPage() {
                     )}
                     <p className="text-sm text-gray-500">{file.page_count} pages</p>
                   </div>
-                  <Link
-                    href={{ pathname: "/file", query: { name: file.pdf_name } }}
-                    className="text-blue-600 hover:underline text-sm"
-                  >
-                    View Pages →
-                  </Link>
+                  <div className="flex items-center gap-4">
+                    <Link
+                      href={{ pathname: "/file", query: { name: file.pdf_name } }}
+                      className="text-blue-600 hover:underline text-sm"
+                    >
+                      View Pages →
+                    </Link>
+                    <button
+                      onClick={() => handleDelete(file.pdf_name)}
+                      className="text-red-600 hover:underline text-sm"
+                    >
+                      Delete
+                    </button>
+                  </div>
                 </div>
               </li>
             ))}
@@ -4,13 +4,50 @@ import cytoscape from "cytoscape";
 
 export default function GraphView() {
   const containerRef = useRef(null);
+  const cyRef = useRef(null);
   const [error, setError] = useState(null);
+  const [mode, setMode] = useState("summary");
+  const [filterType, setFilterType] = useState("tag");
+  const [filterValue, setFilterValue] = useState("");
+  const [query, setQuery] = useState({ mode: "summary" });
+  const [nextCursor, setNextCursor] = useState(null);
   const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
 
+  const graphUrl = (params, cursor) => {
+    const search = new URLSearchParams(params);
+    if (cursor != null) search.set("cursor", cursor);
+    return `${API_BASE}/graph?${search.toString()}`;
+  };
+
+  const loadMore = () => {
+    fetch(graphUrl(query, nextCursor))
+      .then((res) => res.json())
+      .then((data) => {
+        const cy = cyRef.current;
+        const fresh = [...data.nodes, ...data.edges].filter((el) => !el.data.id || cy.getElementById(el.data.id).empty());
+        cy.add(fresh);
+        cy.layout({ name: "cose", animate: true, fit: true, padding: 50 }).run();
+        setNextCursor(data.next_cursor);
+      })
+      .catch((err) => {
+        console.error("Graph fetch failed", err);
+        setError("Failed to load graph data.");
+      });
+  };
+
+  const applyFilter = (e) => {
+    e.preventDefault();
+    const params = { mode };
+    if (filterValue.trim()) params[filterType] = filterValue.trim();
+    setQuery(params);
+  };
+
   useEffect(() => {
-    fetch(`${API_BASE}/graph`)
+    fetch(graphUrl(query))
       .then((res) => res.json())
       .then((data) => {
+        if (cyRef.current) cyRef.current.destroy();
+        setNextCursor(data.next_cursor);
         const cy = cytoscape({
           container: containerRef.current,
           elements: [...data.nodes, ...data.edges],
@@ -41,6 +78,13 @@ export default function GraphView() {
                 textMaxWidth: 70,
               },
             },
+            {
+              selector: "node[page_count]",
+              style: {
+                width: "mapData(page_count, 1, 200, 30, 90)",
+                height: "mapData(page_count, 1, 200, 30, 90)",
+              },
+            },
             {
               selector: "edge",
               style: {
@@ -59,16 +103,40 @@ export default function GraphView() {
             padding: 50,
           },
         });
+        cyRef.current = cy;
       })
       .catch((err) => {
         console.error("Graph fetch failed", err);
         setError("Failed to load graph data.");
       });
-  }, []);
+  }, [query]);
 
   return (
     <main className="min-h-screen bg-gray-50 p-6">
       <h1 className="text-2xl font-bold text-gray-800 mb-4">📊 Graph View</h1>
+      <form onSubmit={applyFilter} className="flex flex-wrap items-center gap-2 mb-4 text-sm">
+        <select value={mode} onChange={(e) => setMode(e.target.value)} className="border rounded p-1">
+          <option value="summary">Tag summary</option>
+          <option value="pages">Pages and tags</option>
+        </select>
+        <select value={filterType} onChange={(e) => setFilterType(e.target.value)} className="border rounded p-1">
+          <option value="tag">Tag</option>
+          <option value="folder">Folder</option>
+          <option value="pdf">PDF</option>
+        </select>
+        <input
+          value={filterValue}
+          onChange={(e) => setFilterValue(e.target.value)}
+          placeholder="Filter (optional)"
+          className="border rounded p-1"
+        />
+        <button type="submit" className="bg-blue-600 text-white rounded px-3 py-1">Show</button>
+        {nextCursor != null && (
+          <button type="button" onClick={loadMore} className="border border-blue-600 text-blue-600 rounded px-3 py-1">
+            Load more pages
+          </button>
+        )}
+      </form>
       {error && <p className="text-red-600">{error}</p>}
       <div
         ref={containerRef}
@@ -5,6 +5,7 @@ export default function Home() {
   const [metadata, setMetadata] = useState(null);
   const [loading, setLoading] = useState(false);
   const [visionOnUpload, setVisionOnUpload] = useState(false);
+  const [replace, setReplace] = useState(false);
 
   const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
 
@@ -15,6 +16,7 @@ export default function Home() {
     const formData = new FormData();
     formData.append("file", file);
     formData.append("vision_on_upload", visionOnUpload ? "true" : "false");
+    formData.append("replace", replace ? "true" : "false");
 
     try {
       const res = await fetch(`${API_BASE}/upload`, {
@@ -57,6 +59,18 @@ export default function Home() {
             Run Vision AI on image-heavy pages after upload
           </label>
         </div>
+        <div className="mb-4 flex items-center gap-2">
+          <input
+            id="replace"
+            type="checkbox"
+            checked={replace}
+            onChange={e => setReplace(e.target.checked)}
+            className="accent-blue-600"
+          />
+          <label htmlFor="replace" className="text-sm text-gray-700">
+            Replace an existing PDF with the same name (only changed pages are re-processed)
+          </label>
+        </div>
         <button
           onClick={handleUpload}
           disabled={!file || loading}
@@ -70,6 +84,15 @@ export default function Home() {
             <h2 className="text-xl font-semibold mb-2 text-gray-800">🧠 Document Metadata</h2>
             <p><strong>Filename:</strong> {metadata.filename}</p>
             <p><strong>Page Count:</strong> {metadata.page_count}</p>
+            {metadata.routing && (
+              <p>
+                <strong>Page Routing:</strong>{" "}
+                {metadata.routing.counts.skip} no AI cleanup,{" "}
+                {metadata.routing.counts.llm_clean} AI cleanup,{" "}
+                {metadata.routing.counts.vision} vision
+                {metadata.routing.paid_calls !== undefined && <> ({metadata.routing.paid_calls} paid API calls)</>}
+              </p>
+            )}
 
             <h3 className="mt-4 font-medium text-gray-700">Content Preview:</h3>
             {Array.isArray(metadata.previews) && metadata.previews.length > 0 ? (
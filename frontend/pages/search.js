@@ -10,6 +10,19 @@ import { CSS } from '@dnd-kit/utilities';
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
 
+// Wraps the [start, end) highlight offsets sent by /search in <mark>
+function Snippet({ text, highlights }) {
+  const parts = [];
+  let pos = 0;
+  (highlights || []).forEach(([start, end], idx) => {
+    if (start > pos) parts.push(text.slice(pos, start));
+    parts.push(<mark key={idx} className="bg-yellow-200">{text.slice(start, end)}</mark>);
+    pos = end;
+  });
+  parts.push(text.slice(pos));
+  return <>{parts}</>;
+}
+
 export default function SearchPage() {
   const [query, setQuery] = useState("");
   const [results, setResults] = useState([]);
@@ -20,6 +33,8 @@ export default function SearchPage() {
   const [titlePage, setTitlePage] = useState("");
   const [tags, setTags] = useState([]);
   const [selectedTag, setSelectedTag] = useState("");
+  const [folder, setFolder] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
     fetch(`${API_BASE}/tags`)
@@ -28,18 +43,26 @@ export default function SearchPage() {
       .catch(err => console.error("Failed to fetch tags", err));
   }, []);
 
-  const handleSearch = async () => {
+  const handleSearch = async (cursor = null) => {
     if (!query) return;
     setLoading(true);
     try {
       const tagParam = selectedTag ? `&tag=${encodeURIComponent(selectedTag)}` : "";
-      const res = await fetch(`${API_BASE}/search?q=${encodeURIComponent(query)}${tagParam}`);
+      const folderParam = folder ? `&folder=${encodeURIComponent(folder)}` : "";
+      const cursorParam = cursor ? `&cursor=${cursor}` : "";
+      const res = await fetch(`${API_BASE}/search?q=${encodeURIComponent(query)}${tagParam}${folderParam}${cursorParam}`);
       const data = await res.json();
-      setResults(data);
-      setSelectedPages([]);
+      setNextCursor(res.headers.get("X-Next-Cursor"));
       const tagMap = {};
       data.forEach((r) => (tagMap[r.page_id] = r.tags || ""));
-      setTagEdits(tagMap);
+      if (cursor) {
+        setResults((prev) => [...prev, ...data]);
+        setTagEdits((prev) => ({ ...prev, ...tagMap }));
+      } else {
+        setResults(data);
+        setSelectedPages([]);
+        setTagEdits(tagMap);
+      }
     } catch (err) {
       console.error("Search failed", err);
     } finally {
@@ -130,7 +153,7 @@ export default function SearchPage() {
                 📘 {page.pdf_name} — Page {page.page_number}
               </div>
               <div className="text-sm text-gray-600 italic mt-1">
-                {page.text.length > 150 ? page.text.slice(0, 150) + "..." : page.text}
+                {page.snippet.length > 150 ? page.snippet.slice(0, 150) + "..." : page.snippet}
               </div>
             </div>
           </div>
@@ -167,7 +190,7 @@ export default function SearchPage() {
               className="flex-1 border border-gray-300 rounded-lg px-4 py-2"
             />
             <button
-              onClick={handleSearch}
+              onClick={() => handleSearch()}
               className="bg-blue-600 hover:bg-blue-700 text-white font-medium px-6 py-2 rounded-lg"
             >
               Search
@@ -186,6 +209,15 @@ export default function SearchPage() {
                 <option key={idx} value={tag}>{tag}</option>
               ))}
             </select>
+            <label htmlFor="folder" className="text-sm text-gray-700 ml-4">Folder:</label>
+            <input
+              id="folder"
+              type="text"
+              value={folder}
+              onChange={(e) => setFolder(e.target.value)}
+              placeholder="e.g. Grade 1"
+              className="border border-gray-300 rounded px-2 py-1 text-sm"
+            />
           </div>
         </div>
 
@@ -258,7 +290,7 @@ export default function SearchPage() {
                   onError={e => { e.target.style.display = 'none'; }}
                 />
                 <p className="text-sm text-gray-700 whitespace-pre-wrap mb-2 flex-1">
-                  {r.text.length > 500 ? r.text.slice(0, 500) + "..." : r.text}
+                  <Snippet text={r.snippet} highlights={r.highlights} />
                 </p>
               </div>
               <div className="flex gap-2 items-center">
@@ -279,6 +311,14 @@ export default function SearchPage() {
           ))}
         </div>
 
+        {nextCursor && !loading && (
+          <button
+            onClick={() => handleSearch(nextCursor)}
+            className="mt-4 w-full text-sm bg-gray-200 hover:bg-gray-300 text-gray-800 px-4 py-2 rounded"
+          >
+            Load more results
+          </button>
+        )}
       </div>
     </main>
   );